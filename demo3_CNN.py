@@ -1,15 +1,13 @@
 import tfnn
-from tensorflow.examples.tutorials.mnist import input_data
+from tfnn.preprocessing.idx_reader import load_mnist
 
-# this is data
-mnist = input_data.read_data_sets('MNIST_data', one_hot=True)
-xs = mnist.train.images
-ys = mnist.train.labels
-data = tfnn.Data(xs, ys)
+# this is data, the uint8 pixels stay memory-mapped and each batch is scaled to [0, 1]
+# the missing train-images-idx3-ubyte.gz and train-labels-idx1-ubyte.gz are downloaded into MNIST_data
+data = load_mnist('MNIST_data', kind='train', one_hot=True)
 train_data, test_data = data.train_test_split(train_rate=0.9)
 
 # to select one classification network
-network = tfnn.ClfNetwork(xs.shape[1], ys.shape[1], do_dropout=True)
+network = tfnn.ClfNetwork(data.n_xfeatures, data.n_yfeatures, do_dropout=True)
 
 # convolution layer1
 network.add_conv_layer(patch_x=5, patch_y=5, n_filters=32,
@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+pytest.importorskip('tensorflow')
+import tfnn
+
+EPSILON = 1e-3
+
+
+def _trained_network(xs, ys):
+    network = tfnn.RegNetwork(xs.shape[1], ys.shape[1])
+    network.add_hidden_layer(4, activator='relu', batch_norm=True)
+    network.add_output_layer()
+    network.set_optimizer('GD')
+    network.set_learning_rate(0.01)
+    for _ in range(5):
+        network.run_step(xs, ys)
+    return network
+
+
+def _layer_values(network):
+    layer = network.layers_results['Layer'][1]
+    return network.sess.run([layer.W, layer.b, layer.gamma, layer.beta,
+                             layer.moving_mean, layer.moving_variance])
+
+
+def test_inference_folds_the_moving_statistics():
+    random = np.random.RandomState(0)
+    xs, ys = random.rand(32, 3).astype(np.float32), random.rand(32, 1).astype(np.float32)
+    with tfnn.Graph().as_default():
+        network = _trained_network(xs, ys)
+        W, b, gamma, beta, moving_mean, moving_variance = _layer_values(network)
+        assert not np.allclose(moving_mean, 0.)
+        product = network.sess.run(network.layers_results['Wx_plus_b'][1],
+                                   feed_dict={network.data_placeholder: xs})
+        expected = (xs.dot(W) + b - moving_mean) / np.sqrt(moving_variance + EPSILON) * gamma + beta
+        np.testing.assert_allclose(product, expected, rtol=1e-4, atol=1e-5)
+        network.close()
+
+
+def test_training_uses_the_batch_statistics():
+    random = np.random.RandomState(1)
+    xs, ys = random.rand(32, 3).astype(np.float32), random.rand(32, 1).astype(np.float32)
+    with tfnn.Graph().as_default():
+        network = _trained_network(xs, ys)
+        W, b, gamma, beta, _, _ = _layer_values(network)
+        product = network.sess.run(network.layers_results['Wx_plus_b'][1],
+                                   feed_dict={network.data_placeholder: xs, network.is_training: True})
+        raw = xs.dot(W) + b
+        expected = (raw - raw.mean(axis=0)) / np.sqrt(raw.var(axis=0) + EPSILON) * gamma + beta
+        np.testing.assert_allclose(product, expected, rtol=1e-4, atol=1e-4)
+        network.close()
@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+pytest.importorskip('tensorflow')
+import tfnn
+
+
+def _trained_variables(xs, ys, initial_values, n_towers):
+    with tfnn.Graph().as_default():
+        network = tfnn.RegNetwork(xs.shape[1], ys.shape[1])
+        network.add_hidden_layer(5, activator='tanh')
+        network.add_output_layer()
+        network.set_optimizer('GD')
+        network.set_learning_rate(0.1)
+        if n_towers > 1:
+            network.set_data_parallel(n_towers)
+        network._check_init()
+        variables = tfnn.trainable_variables()
+        if initial_values is None:
+            initial_values = network.sess.run(variables)
+        else:
+            network.sess.run([var.assign(value) for var, value in zip(variables, initial_values)])
+        network.run_step(xs, ys)
+        values = network.sess.run(variables)
+        global_step = network.sess.run(network.global_step)
+        # the towers leave the thread pools to the default unless asked
+        assert 'inter_op_parallelism_threads' not in network._session_config
+        network.close()
+    return initial_values, values, global_step
+
+
+def test_two_towers_update_like_one():
+    random = np.random.RandomState(0)
+    xs, ys = random.rand(8, 3).astype(np.float32), random.rand(8, 2).astype(np.float32)
+    initial_values, expected, expected_step = _trained_variables(xs, ys, None, n_towers=1)
+    _, got, global_step = _trained_variables(xs, ys, initial_values, n_towers=2)
+    assert global_step == expected_step == 1
+    for value, expected_value in zip(got, expected):
+        np.testing.assert_allclose(value, expected_value, rtol=1e-5, atol=1e-6)
@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+pytest.importorskip('tensorflow')     # importing tfnn imports tensorflow
+import tfnn
+from tfnn.preprocessing.normalizer import Normalizer
+
+
+def _data(n_samples=10):
+    xs = np.arange(n_samples * 3, dtype=np.float32).reshape((n_samples, 3))
+    ys = np.arange(n_samples, dtype=np.float32)[:, np.newaxis]
+    return tfnn.Data(xs, ys)
+
+
+def test_view_gathers_the_parent_rows():
+    data = _data()
+    indices = np.array([7, 2, 2, 5])
+    view = tfnn.DataView(data, indices)
+    assert view.n_samples == 4
+    np.testing.assert_array_equal(view.xs, data.xs[indices])
+    np.testing.assert_array_equal(view.ys, data.ys[indices])
+    xs, ys = view.take(np.array([3, 0]))
+    np.testing.assert_array_equal(xs, data.xs[[5, 7]])
+    np.testing.assert_array_equal(ys, data.ys[[5, 7]])
+
+
+def test_view_of_a_view_points_at_the_root():
+    data = _data()
+    view = tfnn.DataView(tfnn.DataView(data, np.array([9, 8, 7, 6])), np.array([1, 3]))
+    assert view.parent is data
+    np.testing.assert_array_equal(view.indices, [8, 6])
+    np.testing.assert_array_equal(view.xs, data.xs[[8, 6]])
+
+
+def test_random_split_is_a_view():
+    data = _data()
+    train, validate = data.train_test_split(train_rate=0.7)
+    assert isinstance(train, tfnn.DataView)
+    assert train.n_samples == 7 and validate.n_samples == 3
+    np.testing.assert_array_equal(np.sort(np.concatenate([train.indices, validate.indices])), np.arange(10))
+
+
+def test_shuffle_in_place_keeps_the_rows():
+    data = _data()
+    view = tfnn.DataView(data, np.arange(5))
+    view.shuffle(inplace=True)
+    np.testing.assert_array_equal(np.sort(view.ys[:, 0]), np.arange(5))
+    np.testing.assert_array_equal(view.xs, data.xs[view.indices])
+
+
+def test_gather_is_cached():
+    view = tfnn.DataView(_data(), np.array([1, 2]))
+    assert view.xs is view.xs
+
+
+def test_in_place_writes_materialize_the_view():
+    data = _data()
+    view = tfnn.DataView(data, np.array([4, 1, 3]))
+    Normalizer().minmax(view, lower_bound=0, upper_bound=1, inplace=True)
+    assert view.parent is None
+    assert view.n_samples == 3
+    np.testing.assert_allclose(view.xs.min(axis=0), 0.)
+    np.testing.assert_allclose(view.xs.max(axis=0), 1.)
+    np.testing.assert_array_equal(view.ys[:, 0], [4, 1, 3])
+    # the parent is not changed
+    np.testing.assert_array_equal(data.xs[0], [0, 1, 2])
+
+
+def test_copy_owns_its_rows():
+    data = _data()
+    view = tfnn.DataView(data, np.array([0, 9]))
+    copied = view.copy()
+    assert type(copied) is tfnn.Data
+    np.testing.assert_array_equal(copied.xs, data.xs[[0, 9]])
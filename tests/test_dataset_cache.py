@@ -0,0 +1,66 @@
+import os
+import numpy as np
+import pytest
+
+pytest.importorskip('tensorflow')     # importing tfnn imports tensorflow
+import tfnn
+from tfnn.preprocessing.dataset_cache import DatasetCache
+from tfnn.preprocessing.memmap_data import MemmapData
+from tfnn.preprocessing.normalizer import Normalizer
+
+
+@pytest.fixture
+def source(tmpdir):
+    path = os.path.join(str(tmpdir), 'source.csv')
+    with open(path, 'w') as file:
+        file.write('a,b\n1,2\n')
+    return path
+
+
+@pytest.fixture
+def data():
+    random = np.random.RandomState(0)
+    return tfnn.Data(random.rand(10, 3), random.rand(10, 1))
+
+
+def test_array_params_are_hashed_by_content(tmpdir, source):
+    cache = DatasetCache(os.path.join(str(tmpdir), 'cache'))
+    weights = np.zeros(5000)
+    changed = weights.copy()
+    changed[2500] = 1.
+    assert cache.key(source, {'w': weights}) == cache.key(source, {'w': weights.copy()})
+    assert cache.key(source, {'w': weights}) != cache.key(source, {'w': changed})
+    assert cache.key(source, {'w': weights}) != cache.key(source, {'w': weights.astype(np.float32)})
+    assert cache.key(source, {'w': weights}) != cache.key(source, {'w': weights.reshape((50, 100))})
+
+
+def test_a_split_is_cached_as_a_list(tmpdir, source, data):
+    cache = DatasetCache(os.path.join(str(tmpdir), 'cache'))
+    calls = []
+
+    def _build():
+        calls.append(1)
+        return data.train_test_split(0.7, randomly=False)
+
+    for _ in range(2):
+        train, validate = cache.load_or_build(source, _build)
+        assert isinstance(train, MemmapData)
+        np.testing.assert_allclose(train.xs, data.xs[:7])
+        np.testing.assert_allclose(validate.ys, data.ys[7:])
+    assert len(calls) == 1
+
+
+def test_normalizer_and_dictionary(tmpdir, source, data):
+    cache = DatasetCache(os.path.join(str(tmpdir), 'cache'))
+    normalizer = Normalizer().partial_fit(data.xs)
+    datasets, restored = cache.load_or_build(source, lambda: [{'all': data}, normalizer])
+    assert set(datasets.keys()) == {'all'}
+    np.testing.assert_allclose(restored.xs_mean, normalizer.xs_mean)
+
+
+def test_params_without_a_stable_form_raise(tmpdir, source):
+    cache = DatasetCache(os.path.join(str(tmpdir), 'cache'))
+    assert cache.key(source, {'columns': {'b', 'a'}}) == cache.key(source, {'columns': {'a', 'b'}})
+    assert cache.key(source, {'n': np.int64(3)}) == cache.key(source, {'n': 3})
+    with pytest.raises(TypeError):
+        cache.key(source, {'transform': lambda xs: xs})
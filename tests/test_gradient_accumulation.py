@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+pytest.importorskip('tensorflow')
+import tfnn
+
+
+def _trained_variables(batches, initial_values, n_micro_batches):
+    xs, ys = batches[0]
+    with tfnn.Graph().as_default():
+        network = tfnn.RegNetwork(xs.shape[1], ys.shape[1])
+        network.add_hidden_layer(5, activator='tanh')
+        network.add_output_layer()
+        network.set_optimizer('GD')
+        network.set_learning_rate(0.1)
+        if n_micro_batches > 1:
+            network.set_gradient_accumulation(n_micro_batches)
+        network._check_init()
+        variables = tfnn.trainable_variables()
+        if initial_values is None:
+            initial_values = network.sess.run(variables)
+        else:
+            network.sess.run([var.assign(value) for var, value in zip(variables, initial_values)])
+        for b_xs, b_ys in batches:
+            network.run_step(b_xs, b_ys)
+        values = network.sess.run(variables)
+        global_step = network.sess.run(network.global_step)
+        network.close()
+    return initial_values, values, global_step
+
+
+def test_micro_batches_update_like_the_whole_batch():
+    random = np.random.RandomState(0)
+    xs, ys = random.rand(12, 3).astype(np.float32), random.rand(12, 2).astype(np.float32)
+    initial_values, expected, expected_step = _trained_variables([(xs, ys)], None, n_micro_batches=1)
+    micro_batches = [(xs[start:start + 4], ys[start:start + 4]) for start in [0, 4, 8]]
+    _, got, global_step = _trained_variables(micro_batches, initial_values, n_micro_batches=3)
+    assert global_step == expected_step == 1
+    for value, expected_value in zip(got, expected):
+        np.testing.assert_allclose(value, expected_value, rtol=1e-5, atol=1e-6)
@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+
+pytest.importorskip('tensorflow')     # importing tfnn imports tensorflow
+from tfnn.preprocessing.image_augmenter import ImageAugmenter
+
+
+def test_noise_on_uint8_images_saturates():
+    augmenter = ImageAugmenter((4, 4, 1), flip_lr=False, noise_std=50., seed=0)
+    bright = augmenter.augment(np.full((8, 16), 250, dtype=np.uint8))
+    dark = augmenter.augment(np.full((8, 16), 3, dtype=np.uint8))
+    assert bright.dtype == np.uint8
+    # no wrap around, 256 does not become 0 and -1 does not become 255
+    assert bright.min() > 100 and dark.max() < 150
+
+
+def test_flip_and_shift_keep_the_shape_and_pixels():
+    augmenter = ImageAugmenter((3, 3, 1), flip_lr=True, seed=1)
+    images = np.arange(9, dtype=np.float32).reshape((1, 9))
+    flipped = augmenter.augment(np.repeat(images, 20, axis=0))
+    assert flipped.shape == (20, 9)
+    rows = {tuple(row) for row in flipped}
+    assert rows <= {tuple(images[0]), tuple(images[0].reshape((3, 3))[:, ::-1].reshape(-1))}
+
+    shifted = ImageAugmenter((3, 3, 1), flip_lr=False, max_shift=1, seed=2).augment(np.ones((20, 9), np.float32))
+    # the pixels shifted in from outside are 0
+    assert shifted.min() == 0. and shifted.max() == 1.
+    assert (shifted.sum(axis=1) >= 4).all()
+
+
+def test_invalid_arguments_raise():
+    with pytest.raises(ValueError):
+        ImageAugmenter((28, 28))
+    with pytest.raises(ValueError):
+        ImageAugmenter((28, 28, 1), crop_scale=1.5)
@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+pytest.importorskip('tensorflow')     # importing tfnn imports tensorflow
+import tfnn
+
+
+def _data(n_samples=30):
+    xs = np.arange(n_samples * 2, dtype=np.float32).reshape((n_samples, 2))
+    # 2/3 of class 0, 1/3 of class 1
+    ys = np.zeros((n_samples, 2), dtype=np.float32)
+    ys[np.arange(n_samples) % 3 == 0, 1] = 1
+    ys[np.arange(n_samples) % 3 != 0, 0] = 1
+    return tfnn.Data(xs, ys)
+
+
+@pytest.mark.parametrize('stratified', [True, False])
+def test_folds_partition_the_samples(stratified):
+    data = _data()
+    validate_indices = []
+    for train, validate in data.k_fold(n_folds=5, stratified=stratified):
+        assert isinstance(train, tfnn.DataView) and isinstance(validate, tfnn.DataView)
+        assert train.n_samples + validate.n_samples == data.n_samples
+        assert not set(train.indices) & set(validate.indices)
+        validate_indices.append(validate.indices)
+    np.testing.assert_array_equal(np.sort(np.concatenate(validate_indices)), np.arange(data.n_samples))
+
+
+def test_stratified_folds_keep_the_class_proportions():
+    data = _data()
+    for _, validate in data.k_fold(n_folds=5, stratified=True):
+        counts = validate.ys.sum(axis=0)
+        np.testing.assert_array_equal(counts, [4, 2])
+
+
+def test_folds_read_the_rows_of_the_data():
+    data = _data()
+    train, validate = next(data.k_fold(n_folds=3, randomly=False))
+    np.testing.assert_array_equal(validate.xs, data.xs[validate.indices])
+    np.testing.assert_array_equal(train.ys, data.ys[train.indices])
+
+
+def test_invalid_number_of_folds_raises():
+    with pytest.raises(ValueError):
+        next(_data().k_fold(n_folds=1))
+    with pytest.raises(ValueError):
+        next(_data(4).k_fold(n_folds=5))
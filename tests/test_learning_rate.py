@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+pytest.importorskip('tensorflow')
+import tfnn
+
+
+def _network(**schedule):
+    network = tfnn.RegNetwork(2, 1)
+    network.add_output_layer()
+    network.set_optimizer('GD')
+    network.set_learning_rate(**schedule)
+    network._check_init()
+    return network
+
+
+def _lr_at(network, step):
+    network.sess.run(network.global_step.assign(step))
+    return float(network.sess.run(network.lr))
+
+
+def test_cosine_decay():
+    with tfnn.Graph().as_default():
+        network = _network(lr=0.1, cosine_decay=dict(decay_steps=100, alpha=0.1))
+        assert np.isclose(_lr_at(network, 0), 0.1)
+        assert np.isclose(_lr_at(network, 50), 0.1 * (0.9 * 0.5 + 0.1))
+        assert np.isclose(_lr_at(network, 100), 0.01)
+        assert np.isclose(_lr_at(network, 500), 0.01)
+        network.close()
+
+
+def test_piecewise():
+    with tfnn.Graph().as_default():
+        network = _network(lr=None, piecewise=dict(boundaries=[10, 20], values=[0.1, 0.01, 0.001]))
+        for step, lr in [(0, 0.1), (9, 0.1), (10, 0.01), (19, 0.01), (20, 0.001), (100, 0.001)]:
+            assert np.isclose(_lr_at(network, step), lr)
+        network.close()
+
+
+def test_warmup_then_schedule():
+    with tfnn.Graph().as_default():
+        network = _network(lr=0.1, warmup_steps=10)
+        assert np.isclose(_lr_at(network, 0), 0.01)
+        assert np.isclose(_lr_at(network, 4), 0.05)
+        assert np.isclose(_lr_at(network, 9), 0.1)
+        assert np.isclose(_lr_at(network, 50), 0.1)
+        network.close()
+
+
+def test_plateau_reduces_after_patience():
+    with tfnn.Graph().as_default():
+        network = _network(lr=0.1, plateau=dict(factor=0.5, patience=2, min_lr=0.03))
+        assert np.isclose(network.reduce_lr_on_plateau(1.), 0.1)
+        assert np.isclose(network.reduce_lr_on_plateau(1.), 0.1)
+        assert np.isclose(network.reduce_lr_on_plateau(2.), 0.05)
+        assert np.isclose(network.reduce_lr_on_plateau(0.5), 0.05)
+        network.reduce_lr_on_plateau(0.5)
+        # clipped at min_lr
+        assert np.isclose(network.reduce_lr_on_plateau(0.5), 0.03)
+        network.close()
+
+
+def test_only_one_schedule():
+    with tfnn.Graph().as_default():
+        network = tfnn.RegNetwork(2, 1)
+        with pytest.raises(ValueError):
+            network.set_learning_rate(0.1, cosine_decay=dict(decay_steps=10),
+                                      piecewise=dict(boundaries=[1], values=[0.1, 0.01]))
+        with pytest.raises(ValueError):
+            network.set_learning_rate(0.1, piecewise=dict(boundaries=[1], values=[0.1]))
@@ -0,0 +1,77 @@
+import os
+import numpy as np
+import pytest
+
+pytest.importorskip('tensorflow')     # importing tfnn imports tensorflow
+import tfnn
+from tfnn.preprocessing.memmap_data import MemmapData
+from tfnn.preprocessing.normalizer import Normalizer
+
+
+@pytest.fixture
+def data_and_memmap(tmpdir):
+    xs = np.random.RandomState(0).rand(20, 3).astype(np.float32)
+    ys = np.arange(20, dtype=np.float32)[:, np.newaxis]
+    data = tfnn.Data(xs, ys)
+    memmap = MemmapData.from_data(data, os.path.join(str(tmpdir), 'xs.npy'), os.path.join(str(tmpdir), 'ys.npy'))
+    return data, memmap
+
+
+def test_take_reads_the_requested_rows_in_order(data_and_memmap):
+    data, memmap = data_and_memmap
+    indices = np.array([19, 0, 7, 7, 3])
+    xs, ys = memmap.take(indices)
+    np.testing.assert_array_equal(xs, data.xs[indices])
+    np.testing.assert_array_equal(ys, data.ys[indices])
+    xs, ys = memmap.take(slice(2, 5))
+    np.testing.assert_array_equal(xs, data.xs[2:5])
+
+
+def test_take_into_buffers(data_and_memmap):
+    data, memmap = data_and_memmap
+    out = [np.empty((3, 3), np.float32), np.empty((3, 1), np.float32)]
+    xs, ys = memmap.take(np.array([5, 1, 2]), out=out)
+    assert xs is out[0]
+    np.testing.assert_array_equal(xs, data.xs[[5, 1, 2]])
+    np.testing.assert_array_equal(ys, data.ys[[5, 1, 2]])
+
+
+def test_split_and_shuffle_index_the_files(data_and_memmap):
+    data, memmap = data_and_memmap
+    train, validate = memmap.train_test_split(train_rate=0.75)
+    assert isinstance(train, MemmapData) and (train.n_samples, validate.n_samples) == (15, 5)
+    rows = np.concatenate([train.ys[:, 0], validate.ys[:, 0]]).astype(np.int64)
+    np.testing.assert_array_equal(np.sort(rows), np.arange(20))
+    shuffled = train.shuffle()
+    np.testing.assert_array_equal(np.sort(shuffled.ys[:, 0]), np.sort(train.ys[:, 0]))
+    np.testing.assert_array_equal(shuffled.xs, data.xs[shuffled.ys[:, 0].astype(np.int64)])
+
+
+def test_xs_scale_converts_the_batches():
+    pixels = np.arange(12, dtype=np.uint8).reshape((4, 3)) * 20
+    memmap = MemmapData(pixels, np.zeros((4, 1), np.float32), xs_scale=1. / 255)
+    xs, _ = memmap.take(np.array([3, 1]))
+    assert xs.dtype == np.float32
+    np.testing.assert_allclose(xs, pixels[[3, 1]] / 255., rtol=1e-6)
+    np.testing.assert_allclose(memmap.xs, pixels / 255., rtol=1e-6)
+
+
+def test_in_place_writes_raise(data_and_memmap):
+    _, memmap = data_and_memmap
+    with pytest.raises(AttributeError):
+        memmap.xs = np.zeros((20, 3))
+    with pytest.raises(AttributeError):
+        Normalizer().minmax(memmap, inplace=True)
+    normalized = Normalizer().minmax(memmap, lower_bound=0, upper_bound=1)
+    np.testing.assert_allclose(normalized.xs.max(axis=0), 1.)
+
+
+def test_take_on_a_subset(data_and_memmap):
+    data, memmap = data_and_memmap
+    subset = memmap.copy()
+    subset.shuffle(inplace=True)
+    rows = subset._indices
+    xs, ys = subset.take(np.array([0, -1, 4]))
+    np.testing.assert_array_equal(xs, data.xs[rows[[0, -1, 4]]])
+    xs, ys = subset.take(slice(1, 9, 3))
+    np.testing.assert_array_equal(ys, data.ys[rows[1:9:3]])
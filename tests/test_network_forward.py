@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+pytest.importorskip('tensorflow')
+import tfnn
+
+
+def _conv_network():
+    network = tfnn.ClfNetwork(16, 2)
+    network.add_conv_layer(patch_x=2, patch_y=2, n_filters=2, activator='relu', image_shape=(4, 4, 1))
+    network.add_fc_layer(3, activator='relu', batch_norm=True)
+    network.add_output_layer()
+    network.set_optimizer('GD')
+    return network
+
+
+def test_forward_replica_matches_the_network():
+    xs = np.random.RandomState(0).rand(5, 16).astype(np.float32)
+    with tfnn.Graph().as_default():
+        network = _conv_network()
+        layers = network.layers_results['Layer'][1:]
+        before = [(layer.W, layer.b, layer.results_dict, layer.configs_dict) for layer in layers]
+        n_configs = len(network.layers_configs['type'])
+        replica = network._forward(network.data_placeholder)
+        # nothing of the layers or the network is rebuilt
+        assert [(layer.W, layer.b, layer.results_dict, layer.configs_dict) for layer in layers] == before
+        assert len(network.layers_configs['type']) == n_configs
+        network._check_init()
+        outputs = network.layers_results['final'][-1]
+        for is_training in [False, True]:
+            feed_dict = {network.data_placeholder: xs, network.is_training: is_training}
+            expected, got = network.sess.run([outputs, replica], feed_dict=feed_dict)
+            np.testing.assert_allclose(got, expected, rtol=1e-5, atol=1e-6)
+        network.close()
+
+
+def test_run_steps_trains_in_one_session_run():
+    random = np.random.RandomState(1)
+    xs = random.rand(40, 16).astype(np.float32)
+    ys = np.eye(2, dtype=np.float32)[random.randint(2, size=40)]
+    with tfnn.Graph().as_default():
+        network = _conv_network()
+        network._check_init()
+        n_variables = len(tfnn.all_variables())
+        losses = network.run_steps(xs, ys, n_steps=4)
+        assert losses.shape == (4,)
+        assert network.sess.run(network.global_step) == 4
+        # the loop reuses the variables and the optimizer slots of the train op
+        assert len(tfnn.all_variables()) == n_variables
+        network.close()
+
+
+def test_run_steps_rejects_step_schedules():
+    random = np.random.RandomState(2)
+    xs = random.rand(8, 16).astype(np.float32)
+    ys = np.eye(2, dtype=np.float32)[random.randint(2, size=8)]
+    with tfnn.Graph().as_default():
+        network = _conv_network()
+        network.set_learning_rate(0.1, warmup_steps=100)
+        with pytest.raises(AttributeError):
+            network.run_steps(xs, ys, n_steps=2)
+        network.close()
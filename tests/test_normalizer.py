@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+
+pytest.importorskip('tensorflow')     # importing tfnn imports tensorflow
+import tfnn
+from tfnn.preprocessing.normalizer import Normalizer
+
+
+def _xs(n_samples=100, seed=0):
+    return np.random.RandomState(seed).randn(n_samples, 4) * [1., 10., 0.1, 5.] + [0., 3., -2., 100.]
+
+
+def test_partial_fit_chunks_match_the_whole_data():
+    xs = _xs()
+    normalizer = Normalizer()
+    for start, stop in [(0, 7), (7, 50), (50, 51), (51, 100)]:
+        normalizer.partial_fit(xs[start:stop])
+    assert normalizer.stats['n_samples'] == 100
+    np.testing.assert_allclose(normalizer.xs_mean, xs.mean(axis=0))
+    np.testing.assert_allclose(normalizer.xs_std, xs.std(axis=0))
+    np.testing.assert_allclose(normalizer.stats['min'], xs.min(axis=0))
+    np.testing.assert_allclose(normalizer.stats['max'], xs.max(axis=0))
+
+
+def test_merge_matches_one_fit():
+    xs = _xs()
+    normalizer_a = Normalizer().partial_fit(xs[:30])
+    normalizer_b = Normalizer().partial_fit(xs[30:])
+    normalizer_a.merge(normalizer_b)
+    whole = Normalizer().fit([xs])
+    np.testing.assert_allclose(normalizer_a.xs_mean, whole.xs_mean)
+    np.testing.assert_allclose(normalizer_a.xs_std, whole.xs_std)
+
+
+def test_fit_accepts_batches_and_methods():
+    xs = _xs()
+    normalizer = Normalizer().fit([[xs[:40], None], [xs[40:], None]], method='minmax', lower_bound=0, upper_bound=1)
+    n_xs = normalizer.transform(xs)
+    np.testing.assert_allclose(n_xs.min(axis=0), 0., atol=1e-6)
+    np.testing.assert_allclose(n_xs.max(axis=0), 1., atol=1e-6)
+    with pytest.raises(ValueError):
+        Normalizer().partial_fit(xs, method='unknown')
+
+
+def test_std_method_works_after_partial_fit():
+    data = tfnn.Data(_xs(), np.zeros((100, 1)))
+    normalizer = Normalizer().partial_fit(data.xs)
+    normalized = normalizer.std(data, mean=1., std=2.)
+    np.testing.assert_allclose(normalized.xs.mean(axis=0), 1., atol=1e-4)
+    np.testing.assert_allclose(normalized.xs.std(axis=0), 2., atol=1e-4)
+    normalizer.mean(data)
+
+
+def test_transform_matches_center_scale_offset():
+    xs = _xs()
+    normalizer = Normalizer().partial_fit(xs)
+    center, scale, offset = normalizer.get_center_scale_offset()
+    np.testing.assert_allclose(normalizer.transform(xs), (xs - center) * scale + offset, rtol=1e-5, atol=1e-6)
+
+
+def test_large_mean_small_spread_does_not_cancel():
+    xs = 1.6e9 + np.random.RandomState(0).randn(1000, 2) * 10.
+    data = tfnn.Data(xs, np.zeros((1000, 1)), dtype=None)
+    normalized = Normalizer().std(data)
+    expected = (xs - xs.mean(axis=0)) / xs.std(axis=0)
+    np.testing.assert_allclose(normalized.xs, expected, atol=1e-6)
+
+
+def test_fit_transform_sets_nan_to_zero():
+    normalizer = Normalizer().partial_fit(np.array([[1., 2.], [3., 2.]]))
+    n_xs = normalizer.fit_transform(np.array([[np.nan, 2.], [2., 5.]]))
+    np.testing.assert_array_equal(n_xs, [[0., 0.], [0., 0.]])
+
+
+def test_later_fits_keep_the_first_method():
+    xs = _xs()
+    normalizer = Normalizer().partial_fit(xs[:50], method='minmax', lower_bound=0, upper_bound=1)
+    normalizer.partial_fit(xs[50:80])
+    other = Normalizer().partial_fit(xs[80:], method='minmax', lower_bound=0, upper_bound=1)
+    normalizer.merge(other)
+    assert normalizer.method == 'minmax'
+    n_xs = normalizer.transform(xs)
+    np.testing.assert_allclose(n_xs.min(axis=0), 0., atol=1e-6)
+    np.testing.assert_allclose(n_xs.max(axis=0), 1., atol=1e-6)
+    # an empty normalizer takes the method of the one it merges
+    assert Normalizer().merge(other).method == 'minmax'
+    # given explicitly, the method or its kwargs change
+    assert normalizer.partial_fit(xs[:1], method='std').method == 'std'
+    normalizer.partial_fit(xs[:1], std=2.)
+    assert (normalizer.target_mean, normalizer.target_std) == (0, 2.)
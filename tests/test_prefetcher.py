@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+pytest.importorskip('tensorflow')     # importing tfnn imports tensorflow
+import tfnn
+from tfnn.preprocessing.prefetcher import Prefetcher
+
+
+def _batches(n_batches):
+    for i in range(n_batches):
+        yield [np.full((2, 1), i), np.full((2, 1), i)]
+
+
+@pytest.mark.parametrize('n_workers', [1, 3])
+def test_all_batches_then_stop_iteration(n_workers):
+    prefetcher = Prefetcher(_batches(5), n_workers=n_workers)
+    batches = list(prefetcher)
+    assert sorted(int(xs[0, 0]) for xs, _ in batches) == list(range(5))
+    # an exhausted prefetcher does not block on its empty queue
+    for _ in range(3):
+        with pytest.raises(StopIteration):
+            prefetcher.next_batch()
+
+
+def test_worker_error_is_raised_once():
+    def _failing():
+        yield [np.zeros((1, 1)), np.zeros((1, 1))]
+        raise RuntimeError('broken source')
+
+    prefetcher = Prefetcher(_failing())
+    prefetcher.next_batch()
+    with pytest.raises(RuntimeError):
+        prefetcher.next_batch()
+    with pytest.raises(StopIteration):
+        prefetcher.next_batch()
+
+
+def test_data_source_is_endless():
+    data = tfnn.Data(np.arange(10.)[:, np.newaxis], np.arange(10.)[:, np.newaxis])
+    with Prefetcher(data, batch_size=4) as prefetcher:
+        assert prefetcher.source_n_samples == 10
+        for _ in range(6):
+            xs, ys = prefetcher.next_batch()
+            assert xs.shape == (4, 1)
+    with pytest.raises(ValueError):
+        Prefetcher(data)
+
+
+def test_next_batch_after_close_raises():
+    data = tfnn.Data(np.arange(10.)[:, np.newaxis], np.arange(10.)[:, np.newaxis])
+    with Prefetcher(data, batch_size=4, n_workers=2) as prefetcher:
+        prefetcher.next_batch()
+    with pytest.raises(StopIteration):
+        prefetcher.next_batch()
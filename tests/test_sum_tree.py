@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+pytest.importorskip('tensorflow')     # importing tfnn imports tensorflow
+from tfnn.preprocessing.sum_tree import SumTree
+
+
+@pytest.mark.parametrize('n_samples', [1, 2, 5, 8, 13])
+def test_total_is_the_sum_of_the_priorities(n_samples):
+    priorities = np.random.RandomState(0).rand(n_samples)
+    tree = SumTree(priorities)
+    assert np.isclose(tree.total, priorities.sum())
+    np.testing.assert_allclose(tree.priorities, priorities)
+
+
+def test_update_keeps_the_partial_sums():
+    priorities = np.arange(1., 11.)
+    tree = SumTree(priorities)
+    tree.update([0, 3, 3, 9], [5., 0., 0., 2.])
+    priorities[[0, 3, 9]] = [5., 0., 2.]
+    assert np.isclose(tree.total, priorities.sum())
+    np.testing.assert_allclose(tree.priorities, priorities)
+
+
+def test_samples_follow_the_priorities():
+    np.random.seed(0)
+    priorities = np.array([1., 0., 3., 6.])
+    tree = SumTree(priorities)
+    counts = np.bincount(tree.sample(20000), minlength=4)
+    assert counts[1] == 0
+    np.testing.assert_allclose(counts / counts.sum(), priorities / priorities.sum(), atol=0.01)
+
+
+def test_samples_stay_inside_the_data():
+    tree = SumTree(np.ones(5))
+    indices = tree.sample(1000)
+    assert indices.min() >= 0 and indices.max() < 5
+
+
+def test_invalid_priorities_raise():
+    with pytest.raises(ValueError):
+        SumTree([1., -1.])
+    with pytest.raises(ValueError):
+        SumTree(np.ones((2, 2)))
+    tree = SumTree([1., 1.])
+    with pytest.raises(ValueError):
+        tree.update([0], [-1.])
+    tree.update([0, 1], [0., 0.])
+    with pytest.raises(ValueError):
+        tree.sample(1)
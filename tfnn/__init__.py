@@ -4,6 +4,12 @@ from __future__ import print_function
 
 from tensorflow import *
 from tfnn.preprocessing.data import Data
+from tfnn.preprocessing.data_view import DataView
+from tfnn.preprocessing.memmap_data import MemmapData
+from tfnn.preprocessing.prefetcher import Prefetcher
+from tfnn.preprocessing.stream_data import StreamData
+from tfnn.preprocessing.dataset_cache import DatasetCache
+from tfnn.preprocessing.image_augmenter import ImageAugmenter
 from tfnn.body.network_reg import RegNetwork
 from tfnn.body.network_clf import ClfNetwork
 from tfnn.body.norm_layer import FCLayer, HiddenLayer, OutputLayer
@@ -12,3 +18,4 @@ from tfnn.body.network_saver import NetworkSaver
 
 from tfnn.evaluating.evaluator import Evaluator
 from tfnn.evaluating.summarizer import Summarizer
+from tfnn.evaluating.hyper_search import HyperSearch
@@ -11,29 +11,35 @@ class PoolingLayer(object):
         self.name = name
 
     def pool(self, image, layer_size, n_filters):
+        self.output = self.apply(image)
+        stride_x, stride_y = self.strides[0], self.strides[1]
+        length = layer_size[0] / stride_x
+        width = layer_size[1] / stride_y
+        features = n_filters
+        if not (type(length) == int) and (type(width) == int):
+            raise ValueError('pooling dimension error')
+        else:
+            self.out_size = [int(length), int(width), features]
+        return [self.output, self.out_size]
+
+    def apply(self, image):
+        """
+        :return: the pooled image, without changing the pooling layer
+        """
         # stride [1, x_movement, y_movement, 1]
         k_x, k_y = self.ksize[0], self.ksize[1]
         stride_x, stride_y = self.strides[0], self.strides[1]
         if self.pooling == 'max':
-            self.output = tfnn.nn.max_pool(
+            return tfnn.nn.max_pool(
                 value=image, ksize=[1, k_x, k_y, 1],
                 strides=[1, stride_x, stride_y, 1], padding=self.padding)
         elif self.pooling == 'average':
-            self.output = tfnn.nn.avg_pool(
+            return tfnn.nn.avg_pool(
                 value=image, ksize=[1, k_x, k_y, 1],
                 strides=[1, stride_x, stride_y, 1], padding=self.padding)
         else:
             raise ValueError('Not support %s pooling' % self.pooling)
 
-        length = layer_size[0] / stride_x
-        width = layer_size[1] / stride_y
-        features = n_filters
-        if not (type(length) == int) and (type(width) == int):
-            raise ValueError('pooling dimension error')
-        else:
-            self.out_size = [int(length), int(width), features]
-        return [self.output, self.out_size]
-
 
 class ConvLayer(Layer):
     def __init__(self,
@@ -41,7 +47,7 @@ class ConvLayer(Layer):
                  strides=(1, 1), padding='SAME',
                  pooling='max', pool_strides=(2, 2), pool_k=(2, 2),
                  pool_padding='SAME', image_shape=None,
-                 dropout_layer=False, w_initial='xavier', name=None,):
+                 dropout_layer=False, w_initial='xavier', name=None, batch_norm=False,):
         super(ConvLayer, self).__init__(activator, dropout_layer, w_initial,
                                         name, layer_type='conv')
         self._check_activator(activator)
@@ -55,6 +61,7 @@ class ConvLayer(Layer):
         self.pool_k = pool_k
         self.pool_padding = pool_padding
         self.image_shape = image_shape
+        self.batch_norm = batch_norm
         self.pooling_layer = PoolingLayer(
                 pooling=self.pooling,
                 strides=self.pool_strides,
@@ -69,6 +76,7 @@ class ConvLayer(Layer):
                 'pool_strides': self.pool_strides, 'pool_k': self.pool_k,
                 'pool_padding': self.pool_padding, 'dropout_layer': self.dropout_layer,
                 'image_shape': self.image_shape, 'w_initial': self.w_initial, 'name': self.name,
+                'batch_norm': self.batch_norm,
                  }
 
     def construct(self, layers_configs, layers_results):
@@ -112,13 +120,9 @@ class ConvLayer(Layer):
                 self.b = self._bias_variable([self.n_filters, ])
                 tfnn.histogram_summary(self.name + '/biases', self.b)
 
-            with tfnn.name_scope('Wx_plus_b'):
-                product = tfnn.nn.conv2d(
-                    input=layers_results['final'][-1],
-                    filter=self.W,
-                    strides=[1, self.strides[0], self.strides[1], 1],
-                    padding=self.padding) \
-                    + self.b
+            if self.batch_norm:
+                self._build_batch_norm_variables()
+            product = self._product(layers_results['final'][-1], layers_results['is_training'])
 
             if self.activator is None:
                 activated_product = product
@@ -157,6 +161,21 @@ class ConvLayer(Layer):
             'dropped': dropped_product,
             'final': final_product}
 
+    def _shape_inputs(self, inputs):
+        if self.image_shape is None:
+            return inputs
+        # the first conv layer reshapes the flat xs to images
+        with tfnn.name_scope('reshape_inputs'):
+            return tfnn.reshape(inputs, [-1] + list(self.image_shape))
+
+    def _pool(self, activated):
+        with tfnn.name_scope('pooling'):
+            return self.pooling_layer.apply(activated)
+
+    def _linear(self, inputs, W):
+        return tfnn.nn.conv2d(input=inputs, filter=W,
+                              strides=[1, self.strides[0], self.strides[1], 1], padding=self.padding)
+
     def _check_image_shape(self, layers_configs, layers_results):
         """
         have effect only on the first conv layer
@@ -18,6 +18,7 @@ class Layer(object):
         self.w_initial = w_initial
         self.name = name
         self.layer_type = layer_type
+        self.batch_norm = False
         self._params = {
                  'activator': self.activator_name,
                  'dropout_layer': self.dropout_layer,
@@ -31,6 +32,23 @@ class Layer(object):
     def construct(self, *args, **kwargs):
         raise NotImplementedError("Abstract method")
 
+    def forward(self, inputs, is_training, keep_prob=None):
+        """
+        Build the layer again on inputs with its existing variables, like the replicas of the
+        data-parallel towers and of run_steps do. The layer is not changed and no summary is added.
+        :param inputs: the output tensor of the previous layer
+        :param is_training: the boolean tensor of the network
+        :param keep_prob: the keep probability tensor, None without dropout
+        :return: the output tensor of the layer
+        """
+        with tfnn.name_scope(self.name):
+            product = self._product(self._shape_inputs(inputs), is_training)
+            outputs = product if self.activator is None else self.activator(product)
+            outputs = self._pool(outputs)
+            if (keep_prob is not None) and self.dropout_layer:
+                outputs = tfnn.nn.dropout(outputs, keep_prob, name='dropout')
+        return outputs
+
     def get_Wshape(self):
         return self.W.get_shape()
 
@@ -65,9 +83,9 @@ class Layer(object):
                 self.b = self._bias_variable([n_neurons, ])
                 tfnn.histogram_summary(self.name + '/biases', self.b)
 
-            with tfnn.name_scope('Wx_plus_b'):
-                product = tfnn.add(tfnn.matmul(layers_results['final'][-1], self.W, name='Wx'),
-                                   self.b, name='Wx_add_b')
+            if self.batch_norm:
+                self._build_batch_norm_variables()
+            product = self._product(layers_results['final'][-1], layers_results['is_training'])
 
             if self.activator is None:
                 activated_product = product
@@ -100,6 +118,63 @@ class Layer(object):
             'final': final_product
         }
 
+    def _shape_inputs(self, inputs):
+        return inputs
+
+    def _pool(self, activated):
+        return activated
+
+    def _linear(self, inputs, W):
+        return tfnn.matmul(inputs, W, name='Wx')
+
+    def _product(self, inputs, is_training):
+        """
+        Wx_plus_b of inputs, batch normalized when the layer has batch_norm.
+        """
+        if self.batch_norm:
+            return self._batch_norm_product(inputs, is_training)
+        with tfnn.name_scope('Wx_plus_b'):
+            return tfnn.add(self._linear(inputs, self.W), self.b, name='Wx_add_b')
+
+    def _build_batch_norm_variables(self):
+        n_neurons = self.b.get_shape().as_list()[-1]
+        with tfnn.variable_scope('batch_norm'):
+            self.gamma = tfnn.get_variable('gamma', [n_neurons], initializer=tfnn.constant_initializer(1.))
+            self.beta = tfnn.get_variable('beta', [n_neurons], initializer=tfnn.constant_initializer(0.))
+            self.moving_mean = tfnn.get_variable('moving_mean', [n_neurons], trainable=False,
+                                                 initializer=tfnn.constant_initializer(0.))
+            self.moving_variance = tfnn.get_variable('moving_variance', [n_neurons], trainable=False,
+                                                     initializer=tfnn.constant_initializer(1.))
+
+    def _batch_norm_product(self, inputs, is_training, decay=0.99, epsilon=1e-3):
+        """
+        Wx_plus_b followed by batch normalization. In training the batch statistics normalize
+        the product and update the moving mean and variance. In inference the moving statistics
+        are folded into W and b, so it is a single linear map like a layer without batch norm.
+        :param inputs: the inputs of the layer
+        :param is_training: the boolean tensor of the network
+        """
+        gamma, beta = self.gamma, self.beta
+        moving_mean, moving_variance = self.moving_mean, self.moving_variance
+        # the statistics are over all but the last axis of the product
+        axes = list(range(inputs.get_shape().ndims - 1))
+
+        def _training():
+            product = tfnn.add(self._linear(inputs, self.W), self.b, name='Wx_add_b')
+            batch_mean, batch_variance = tfnn.nn.moments(product, axes)
+            update_mean = moving_mean.assign_sub((moving_mean - batch_mean) * (1. - decay))
+            update_variance = moving_variance.assign_sub((moving_variance - batch_variance) * (1. - decay))
+            with tfnn.control_dependencies([update_mean, update_variance]):
+                return tfnn.nn.batch_normalization(product, batch_mean, batch_variance, beta, gamma, epsilon)
+
+        def _inference():
+            scale = gamma * tfnn.rsqrt(moving_variance + epsilon)
+            return tfnn.add(self._linear(inputs, self.W * scale), (self.b - moving_mean) * scale + beta,
+                            name='folded_Wx_add_b')
+
+        with tfnn.name_scope('Wx_plus_b'):
+            return tfnn.cond(is_training, _training, _inference)
+
     def _check_name(self, layers_configs):
         if self.name is None:
             if self.layer_type == 'hidden':
@@ -1,16 +1,31 @@
+import os
 import numpy as np
 import time
+import threading
+import multiprocessing
 import tfnn
 from tfnn.body.layer import Layer
 from tfnn.preprocessing.normalizer import Normalizer
+from tfnn.preprocessing.prefetcher import Prefetcher
 
 
 class Network(object):
-    def __init__(self, input_size, output_size, do_dropout, do_l2, ntype):
+    def __init__(self, input_size, output_size, do_dropout, do_l2, ntype, normalize_in_graph=False):
+        """
+
+        :param normalize_in_graph: if True, the network normalizes its inputs in the graph with the
+                        config of self.normalizer, see fuse_normalizer(). Then all the xs fed for
+                        training, evaluating and predicting are the raw features.
+        """
         self.normalizer = Normalizer()
+        self.normalize_in_graph = normalize_in_graph
         self.input_size = input_size
         self.output_size = output_size
         self.global_step = tfnn.Variable(0, trainable=False)
+        self.n_towers = 1
+        self.n_micro_batches = 1
+        self._session_config = {}
+        self._cpu_set = None
         if do_dropout and do_l2:
             raise ValueError('Cannot do dropout and l2 at once. Choose only one of them.')
         if do_dropout:
@@ -24,9 +39,9 @@ class Network(object):
             self.data_placeholder = tfnn.placeholder(dtype=tfnn.float32,
                                                      shape=[None, self.input_size],
                                                      name='x_input')
-            self.target_placeholder = tfnn.placeholder(dtype=tfnn.float32,
-                                                       shape=[None, self.output_size],
-                                                       name='y_input')
+            self.target_placeholder = self._build_target_placeholder()
+            # True in the training steps, the batch norm layers use the batch statistics
+            self.is_training = tfnn.placeholder_with_default(False, shape=[], name='is_training')
             if do_dropout:
                 self.keep_prob_placeholder = tfnn.placeholder(dtype=tfnn.float32)
                 tfnn.scalar_summary('dropout_keep_probability', self.keep_prob_placeholder)
@@ -38,6 +53,14 @@ class Network(object):
             else:
                 _reg_value = None
 
+        if normalize_in_graph:
+            with tfnn.name_scope('normalize_inputs'):
+                # variables rather than constants, so the normalizer can be fitted after the
+                # layers are built, and the Saver keeps the values with the model
+                self._xs_center = tfnn.Variable(tfnn.zeros([self.input_size]), trainable=False, name='xs_center')
+                self._xs_scale = tfnn.Variable(tfnn.ones([self.input_size]), trainable=False, name='xs_scale')
+                self._xs_offset = tfnn.Variable(tfnn.zeros([self.input_size]), trainable=False, name='xs_offset')
+
         self.layers_configs = {
             'type': ['input'],
             'name': ['input_layer'],
@@ -46,11 +69,12 @@ class Network(object):
         }
         self.layers_results = {
             'reg_value': _reg_value,
+            'is_training': self.is_training,
             'Layer': [None],
             'Wx_plus_b': [None],
             'activated': [None],
             'dropped': [None],
-            'final': [self.data_placeholder]
+            'final': [self._connect_inputs()]
         }
 
     def build_layers(self, layers):
@@ -70,19 +94,20 @@ class Network(object):
                              'Not a %s' % type(layers))
 
     def add_hidden_layer(self, n_neurons, activator=None, dropout_layer=False,
-                         w_initial='xavier', name=None,):
+                         w_initial='xavier', name=None, batch_norm=False,):
         """
         For original or simple neural network.
+        :param batch_norm: batch normalize the Wx_plus_b, with moving statistics for predicting
         """
         _layer = tfnn.HiddenLayer(n_neurons, activator, dropout_layer,
-                                  w_initial, name)
+                                  w_initial, name, batch_norm)
         _layer.construct(self.layers_configs, self.layers_results)
         self._add_to_log(_layer)
 
     def add_fc_layer(self, n_neurons, activator=None, dropout_layer=False,
-                     w_initial='xavier', name=None):
+                     w_initial='xavier', name=None, batch_norm=False):
         _layer = tfnn.FCLayer(n_neurons, activator, dropout_layer,
-                              w_initial, name)
+                              w_initial, name, batch_norm)
         _layer.construct(self.layers_configs, self.layers_results)
         self._add_to_log(_layer)
 
@@ -92,12 +117,13 @@ class Network(object):
                        pooling='max', pool_strides=(2, 2), pool_k=(2, 2),
                        pool_padding='SAME', image_shape=None,
                        dropout_layer=False, w_initial='xavier', name=None,
+                       batch_norm=False,
                        ):
         _layer = tfnn.ConvLayer(
             patch_x, patch_y, n_filters, activator,
             strides, padding, pooling, pool_strides, pool_k,
             pool_padding, image_shape,
-            dropout_layer, w_initial, name)
+            dropout_layer, w_initial, name, batch_norm)
         _layer.construct(self.layers_configs, self.layers_results)
         self._add_to_log(_layer)
 
@@ -109,14 +135,30 @@ class Network(object):
         self._add_to_log(_layer)
         self._init_loss()
 
-    def set_learning_rate(self, lr, exp_decay=None):
+    def set_learning_rate(self, lr, exp_decay=None, cosine_decay=None, piecewise=None,
+                          warmup_steps=None, plateau=None):
         """
-
+        All the schedules follow global_step. Set the learning rate before the first training step.
         :param lr:
         :param exp_decay: a dictionary like dict(decay_steps=None, decay_rate=None, staircase=False, name=None),
                         otherwise None.
+        :param cosine_decay: a dictionary like dict(decay_steps=None, alpha=0.), anneal lr to alpha * lr
+                        along half a cosine over decay_steps, otherwise None.
+        :param piecewise: a dictionary like dict(boundaries=[10000, 20000], values=[0.1, 0.01, 0.001]),
+                        the learning rate is values[i] from boundaries[i-1] to boundaries[i], lr is
+                        not used. Otherwise None.
+        :param warmup_steps: raise the learning rate linearly to the scheduled one over the first
+                        warmup_steps steps.
+        :param plateau: a dictionary like dict(factor=0.1, patience=5, min_lr=0.), to multiply the
+                        learning rate by factor when the monitored metric has not improved for patience
+                        checks, see reduce_lr_on_plateau() and Evaluator.reduce_lr_on_plateau().
         :return:
         """
+        if sum(schedule is not None for schedule in [exp_decay, cosine_decay, piecewise]) > 1:
+            raise ValueError('Choose only one of exp_decay, cosine_decay and piecewise')
+        self._lr_follows_step = any(schedule is not None for schedule in [exp_decay, cosine_decay, piecewise]) \
+            or bool(warmup_steps)
+        _step = tfnn.cast(self.global_step, tfnn.float32)
         if isinstance(exp_decay, dict):
             if 'decay_steps' not in exp_decay:
                 raise KeyError('Set decay_steps in exp_decay=dict(decay_steps)')
@@ -131,10 +173,64 @@ class Network(object):
                                                    decay_rate=exp_decay['decay_rate'],
                                                    staircase=exp_decay['staircase'],
                                                    name=exp_decay['name'])
+        elif isinstance(cosine_decay, dict):
+            if 'decay_steps' not in cosine_decay:
+                raise KeyError('Set decay_steps in cosine_decay=dict(decay_steps)')
+            alpha = cosine_decay.get('alpha', 0.)
+            _progress = tfnn.minimum(_step, cosine_decay['decay_steps']) / cosine_decay['decay_steps']
+            self._lr = tfnn.mul(float(lr), (1. - alpha) * 0.5 * (1. + tfnn.cos(np.pi * _progress)) + alpha,
+                                name='cosine_decay')
+        elif isinstance(piecewise, dict):
+            boundaries, values = piecewise['boundaries'], piecewise['values']
+            if len(values) != len(boundaries) + 1:
+                raise ValueError('piecewise needs one more value than boundaries')
+            _lr = tfnn.constant(float(values[0]))
+            for boundary, value_before, value_after in zip(boundaries, values[:-1], values[1:]):
+                _lr += (value_after - value_before) * tfnn.cast(tfnn.greater_equal(_step, boundary), tfnn.float32)
+            self._lr = tfnn.identity(_lr, name='piecewise_constant')
         else:
             self._lr = tfnn.constant(lr)
+        if warmup_steps:
+            self._lr = tfnn.mul(self._lr, tfnn.minimum(1., (_step + 1.) / warmup_steps), name='warmup')
+        if isinstance(plateau, dict):
+            self._plateau = {'factor': plateau.get('factor', 0.1), 'patience': plateau.get('patience', 5),
+                             'min_lr': plateau.get('min_lr', 0.), 'best': None, 'n_bad_checks': 0}
+            with tfnn.name_scope('plateau'):
+                self._lr_scale = tfnn.Variable(1., trainable=False, name='lr_scale')
+                self._new_lr_scale = tfnn.placeholder(tfnn.float32, shape=[])
+                self._assign_lr_scale = self._lr_scale.assign(self._new_lr_scale)
+            self._lr = tfnn.mul(self._lr, self._lr_scale, name='plateau_lr')
         tfnn.scalar_summary('learning_rate', self._lr)
 
+    def reduce_lr_on_plateau(self, value, mode='min'):
+        """
+        Check a validation metric, and reduce the learning rate after patience checks without
+        improvement. Needs set_learning_rate(plateau=dict(...)).
+        :param value: the metric, like the validation cost
+        :param mode: 'min' if lower values are better, 'max' if higher values are better
+        :return: the current learning rate
+        """
+        if not hasattr(self, '_plateau'):
+            raise AttributeError('Set plateau in set_learning_rate() first')
+        if mode not in ['min', 'max']:
+            raise ValueError("mode should be one of ['min', 'max'], not %s" % mode)
+        self._check_init()
+        _plateau = self._plateau
+        if (_plateau['best'] is None) or \
+                (value < _plateau['best'] if mode == 'min' else value > _plateau['best']):
+            _plateau['best'] = value
+            _plateau['n_bad_checks'] = 0
+        else:
+            _plateau['n_bad_checks'] += 1
+            if _plateau['n_bad_checks'] >= _plateau['patience']:
+                scale, lr = self.sess.run([self._lr_scale, self._lr])
+                new_scale = scale * _plateau['factor']
+                if (lr > 0) and (lr * _plateau['factor'] < _plateau['min_lr']):
+                    new_scale = scale * _plateau['min_lr'] / lr
+                self.sess.run(self._assign_lr_scale, feed_dict={self._new_lr_scale: new_scale})
+                _plateau['n_bad_checks'] = 0
+        return self.sess.run(self._lr)
+
     def set_optimizer(self, optimizer=None, *args, **kwargs):
         """
 
@@ -185,16 +281,247 @@ class Network(object):
         if self.layers_configs['type'][-1] != 'output':
             raise NotImplementedError('Please add output layer.')
 
+    def set_input_pipeline(self, batch_size, capacity=None):
+        """
+        Read the training batches from an in-graph queue instead of the feed_dict. Call it
+        before adding the layers, then start_input_pipeline(data) after the optimizer is set,
+        and train with run_step(None, None, ...). A background thread enqueues the batches, so
+        the train op never waits on Python to build the feeds. Feeding the placeholders, like
+        predict() and the Evaluator do, bypasses the queue.
+        :param batch_size: the number of samples dequeued for each training step
+        :param capacity: the maximum number of samples waiting in the queue, default 10 batches
+        """
+        if len(self) > 0:
+            raise AttributeError('Set the input pipeline before adding the layers')
+        if capacity is None:
+            capacity = 10 * batch_size
+        ys_shape = self.target_placeholder.get_shape()
+        with tfnn.name_scope('input_pipeline'):
+            self._enqueue_xs = tfnn.placeholder(tfnn.float32, shape=[None, self.input_size], name='enqueue_xs')
+            self._enqueue_ys = tfnn.placeholder(self.target_placeholder.dtype, shape=ys_shape,
+                                                name='enqueue_ys')
+            self._input_queue = tfnn.FIFOQueue(capacity, [tfnn.float32, self.target_placeholder.dtype],
+                                               shapes=[[self.input_size], ys_shape[1:]])
+            self._enqueue_op = self._input_queue.enqueue_many([self._enqueue_xs, self._enqueue_ys])
+            _queued_xs, _queued_ys = self._input_queue.dequeue_many(batch_size)
+            # built here, the enqueue thread and stop_input_pipeline() only run them
+            self._close_queue = self._input_queue.close()
+            self._cancel_queue = self._input_queue.close(cancel_pending_enqueues=True)
+        with tfnn.name_scope('inputs'):
+            # the dequeue only runs when the placeholders are not fed
+            self.data_placeholder = tfnn.placeholder_with_default(
+                _queued_xs, shape=[None, self.input_size], name='x_input')
+            self.target_placeholder = tfnn.placeholder_with_default(
+                _queued_ys, shape=ys_shape, name='y_input')
+        self.layers_results['final'][0] = self._connect_inputs()
+        self._pipeline_batch_size = batch_size
+
+    def start_input_pipeline(self, data, shuffle=True):
+        """
+        Start the background thread which enqueues the batches of data. It runs until
+        stop_input_pipeline() or close().
+        :param data: tfnn.Data, or any tfnn.Data-like source with batch_iterator()
+        :param shuffle: reshuffle the data at every epoch
+        """
+        if not hasattr(self, '_input_queue'):
+            raise AttributeError('Call set_input_pipeline() before adding the layers')
+        if hasattr(self, '_pipeline_thread'):
+            raise AttributeError('The input pipeline has been started')
+        self._check_init()
+        # the queued batches are copied by the enqueue, the buffers can be reused
+        batches = data.batch_iterator(self._pipeline_batch_size, shuffle=shuffle)
+
+        def _enqueue():
+            try:
+                while True:
+                    b_xs, b_ys = next(batches)
+                    self.sess.run(self._enqueue_op, feed_dict={self._enqueue_xs: self._format_xs(b_xs),
+                                                               self._enqueue_ys: self._format_ys(b_ys)})
+            except (tfnn.errors.CancelledError, tfnn.errors.AbortedError):
+                # the queue is closed by stop_input_pipeline()
+                pass
+            except Exception:
+                # close the queue, so the training step fails instead of waiting forever
+                self.sess.run(self._close_queue)
+                raise
+
+        self._pipeline_thread = threading.Thread(target=_enqueue)
+        self._pipeline_thread.daemon = True
+        self._pipeline_thread.start()
+
+    def stop_input_pipeline(self):
+        """
+        Close the queue and stop the enqueue thread. The queue cannot be restarted afterwards.
+        """
+        if hasattr(self, '_pipeline_thread'):
+            self.sess.run(self._cancel_queue)
+            self._pipeline_thread.join()
+            del self._pipeline_thread
+
+    def set_session_config(self, intra_op_threads=None, inter_op_threads=None, cpu_set=None):
+        """
+        Limit the threads of the session, so several processes on one host do not oversubscribe
+        the cores. Set it before the first training step, or use auto_tune_session().
+        :param intra_op_threads: the size of the pool which parallelizes single ops like matmul,
+                        None for the number of cores
+        :param inter_op_threads: the size of the pool which runs independent ops side by side,
+                        None for the number of cores
+        :param cpu_set: None, or the cores the threads of the session run on, like range(8, 16).
+                        Linux only. It pins the thread which creates the session and every thread
+                        started by it afterwards, threads which exist already keep their cores.
+        A thread count gives the session its own thread pools. Without one, TensorFlow shares the
+        pools built by the first session of the process.
+        """
+        if hasattr(self, 'sess'):
+            raise AttributeError('The session exists, set the session config before the first training step')
+        if (cpu_set is not None) and not hasattr(os, 'sched_setaffinity'):
+            raise AttributeError('Setting a cpu_set is not supported on this platform')
+        for key, value in [('intra_op_parallelism_threads', intra_op_threads),
+                           ('inter_op_parallelism_threads', inter_op_threads)]:
+            if value is None:
+                self._session_config.pop(key, None)
+            else:
+                self._session_config[key] = value
+        self._cpu_set = None if cpu_set is None else set(cpu_set)
+
+    def auto_tune_session(self, feed_xs, feed_ys, settings=None, n_steps=20, *args, **kwargs):
+        """
+        Measure the training steps per second of one batch for some session configs and keep
+        the fastest one. Run it before training, the variables are initialized again afterwards.
+        :param feed_xs: a typical training batch of xs
+        :param feed_ys: its ys
+        :param settings: a list of dictionaries of set_session_config() arguments, default the
+                        powers of 2 up to the number of cores for intra_op_threads, with 1 and 2
+                        inter_op_threads
+        :param n_steps: the number of timed steps for each setting, after 3 warm-up steps
+        :param kwargs: keep_prob or l2_value, as for run_step
+        :return: [the best setting, a list of [setting, steps per second]]
+        """
+        if hasattr(self, 'sess'):
+            raise AttributeError('The session exists, auto tune before the first training step')
+        if settings is None:
+            if self._cpu_set is not None:
+                n_cores = len(self._cpu_set)
+            elif hasattr(os, 'sched_getaffinity'):
+                n_cores = len(os.sched_getaffinity(0))
+            else:
+                n_cores = multiprocessing.cpu_count()
+            intra_threads = [2 ** i for i in range(int(np.log2(n_cores)) + 1)]
+            settings = [{'intra_op_threads': intra, 'inter_op_threads': inter, 'cpu_set': self._cpu_set}
+                        for intra in intra_threads for inter in [1, 2]]
+        if not hasattr(self, '_init'):
+            self._build_train_op()
+        _feed_dict = self._get_feed_dict(feed_xs, feed_ys, *args, **kwargs)
+        results = []
+        for setting in settings:
+            self.set_session_config(**setting)
+            sess = self._new_session()
+            sess.run(self._init)
+            for _ in range(3):
+                sess.run(self._train_op, feed_dict=_feed_dict)
+            time_start = time.time()
+            for _ in range(n_steps):
+                sess.run(self._train_op, feed_dict=_feed_dict)
+            results.append([setting, n_steps / max(time.time() - time_start, 1e-9)])
+            sess.close()
+        best_setting = max(results, key=lambda result: result[1])[0]
+        self.set_session_config(**best_setting)
+        self._make_session()
+        return [best_setting, results]
+
+    def set_gradient_accumulation(self, n_micro_batches):
+        """
+        Accumulate the gradients of n_micro_batches batches and update the variables once with
+        their mean, like training on one batch n_micro_batches times as large. The memory of the
+        activations is still that of one micro-batch. run_step and fit feed the micro-batches,
+        global_step counts the updates. Set it before the first training step.
+        :param n_micro_batches: the number of batches of one update
+        """
+        if hasattr(self, '_init'):
+            raise AttributeError('Set gradient accumulation before the first training step')
+        if n_micro_batches < 1:
+            raise ValueError('n_micro_batches must be at least 1, not %i' % n_micro_batches)
+        self.n_micro_batches = n_micro_batches
+
+    def set_data_parallel(self, n_towers, n_threads=None):
+        """
+        Synchronous data-parallel training. Every batch is split across n_towers replicas of
+        the layers with shared variables, and their gradients are averaged before one update.
+        build_layers, run_step and fit work as usual. Set it before the first training step.
+        :param n_towers: the number of replicas, with fewer samples than n_towers the empty towers are skipped
+        :param n_threads: the size of the thread pool shared by the ops of all the towers,
+                        default the number of cores. set_session_config(inter_op_threads=n_towers)
+                        runs the ops of the towers side by side.
+        """
+        if hasattr(self, '_init'):
+            raise AttributeError('Set data parallel before the first training step')
+        if n_towers < 1:
+            raise ValueError('n_towers must be at least 1, not %i' % n_towers)
+        self.n_towers = n_towers
+        if n_threads is not None:
+            self._session_config['intra_op_parallelism_threads'] = n_threads
+
     def run_step(self, feed_xs, feed_ys, *args, **kwargs):
-        if np.ndim(feed_xs) == 1:
-            feed_xs = feed_xs[np.newaxis, :]
-        if np.ndim(feed_ys) == 1:
-            feed_ys = feed_ys[np.newaxis, :]
+        """
+        :param feed_xs: xs, or None to take the batch from the input pipeline
+        :param feed_ys: ys, or None with the input pipeline
+        :param args, kwargs: keep_prob or l2_value
+        """
         self._check_init()
         _feed_dict = self._get_feed_dict(feed_xs, feed_ys, *args, **kwargs)
-        self.sess.run(self._train_op, feed_dict=_feed_dict)
+        self._run_train_op(self._train_op, _feed_dict)
 
-    def fit(self, feed_xs, feed_ys, steps=None, *args, **kwargs):
+    def run_steps(self, feed_xs, feed_ys, n_steps, *args, **kwargs):
+        """
+        Run n_steps training steps in one session run. The block of batches is fed once and an
+        in-graph loop trains on one batch after the other, so the per-step Python and session
+        overhead is paid once. This speeds up small networks the most. The learning rate is read
+        once for all the steps, so the schedules which follow global_step (exp_decay, cosine_decay,
+        piecewise and warmup_steps) are rejected.
+        :param feed_xs: n_steps batches of xs one after the other, shape(n_steps * batch_size, n_xs),
+                        like data.next_batch(n_steps * batch_size)[0]
+        :param feed_ys: the ys of the batches
+        :param n_steps: the number of steps, it must divide the number of samples
+        :param args, kwargs: keep_prob or l2_value
+        :return: the losses of the steps, shape(n_steps,)
+        """
+        if self.n_micro_batches > 1:
+            raise AttributeError('run_steps does not support gradient accumulation')
+        if len(feed_xs) % n_steps != 0:
+            raise ValueError('%i samples cannot be split into %i batches' % (len(feed_xs), n_steps))
+        self._check_init()
+        if getattr(self, '_lr_follows_step', False):
+            raise AttributeError('run_steps reads the learning rate once for all the steps, '
+                                 'use run_step with a learning rate schedule')
+        if not hasattr(self, '_multi_step_losses'):
+            self._build_multi_step()
+        _feed_dict = self._get_feed_dict(None, None, *args, **kwargs)
+        _feed_dict[self._block_xs] = self._format_xs(feed_xs)
+        _feed_dict[self._block_ys] = self._format_ys(feed_ys)
+        _feed_dict[self._block_n_steps] = n_steps
+        return self.sess.run(self._multi_step_losses, feed_dict=_feed_dict)
+
+    def fit(self, feed_xs, feed_ys=None, steps=None, *args, batch_size=50, epochs=None, log_every=None,
+            metrics=None, **kwargs):
+        """
+        Train the network. The loss and the metrics are fetched in the same session run as the
+        train op, so logging costs no extra forward pass.
+        :param feed_xs: xs, or a batch source like tfnn.Data, StreamData or tfnn.Prefetcher when
+                        feed_ys is None
+        :param feed_ys: ys
+        :param steps: number of training steps, default the number of samples. A Prefetcher over an
+                        iterator is trained on until it runs out, one over a tfnn.Data never does
+                        and needs steps or epochs.
+        :param batch_size: keyword only, the batch size, a Prefetcher uses its own
+        :param epochs: keyword only, the number of passes over the data, instead of steps
+        :param log_every: keyword only, print the progress every log_every steps, None to print nothing
+        :param metrics: keyword only, a dictionary of {name: tensor} to fetch with the loss,
+                        like {'accuracy': evaluator.accuracy}
+        :param kwargs: keep_prob or l2_value, as for run_step
+        :return: history, a structured array with one row per step and the fields 'loss',
+                the metric names and 'samples_per_sec'. The loss is the one of the training
+                step, with dropout applied.
+        """
         def _print_log(log):
             print('\r{}'.format(log), end='')
 
@@ -218,32 +545,152 @@ class Network(object):
             _percentage = str(round(step / steps * 100, 2)) + '%'
             return [_time_remaining, _percentage]
 
-        train_data = tfnn.Data(feed_xs, feed_ys)
-        if steps is None:
-            steps = train_data.n_samples
-        time_start = time.time()
-        for step in range(1, steps+1):
-            b_xs, b_ys = train_data.next_batch(50)
-            self.run_step(feed_xs=b_xs, feed_ys=b_ys, *args, **kwargs)
-            if step % 200 == 0:
-                time_cost = time.time() - time_start
-                time_remaining, percentage = _get_progress(time_cost, step, steps)
-                feed_dict = self._get_feed_dict(b_xs, b_ys, keep_prob=1., l2_value=0.)
-                cost = self.sess.run(self.loss, feed_dict=feed_dict)
-                _log = percentage + ' | ETA: ' + str(time_remaining) + ' | Cost: ' + \
-                       str(round(cost, 5))
+        if feed_ys is None:
+            # feed_xs is already a batch source, like a tfnn.Data or a tfnn.Prefetcher
+            train_data = feed_xs
+        else:
+            train_data = tfnn.Data(feed_xs, feed_ys)
+        is_prefetcher = isinstance(train_data, Prefetcher)
+        if epochs is not None:
+            if not is_prefetcher:
+                steps = int(np.ceil(epochs * train_data.n_samples / batch_size))
+            elif train_data.source_n_samples is not None:
+                steps = int(np.ceil(epochs * train_data.source_n_samples / train_data.batch_size))
+            else:
+                raise ValueError('The epochs of a Prefetcher over an iterator are set by its source, use steps')
+        elif steps is None:
+            if not is_prefetcher:
+                steps = train_data.n_samples
+            elif train_data.source_n_samples is not None:
+                raise ValueError('A Prefetcher over a tfnn.Data never runs out, set steps or epochs')
+        metric_names = [] if metrics is None else list(metrics.keys())
+        self._check_init()
+        fetches = [self._train_op, self._train_loss] + [metrics[name] for name in metric_names]
+
+        history = []
+        time_start = time_last = time_log = time.time()
+        step, n_log_samples = 0, 0
+        while (steps is None) or (step < steps):
+            try:
+                if is_prefetcher:
+                    b_xs, b_ys = train_data.next_batch()
+                else:
+                    b_xs, b_ys = train_data.next_batch(batch_size)
+            except StopIteration:
+                break
+            results = self._run_train_op(fetches, self._get_feed_dict(b_xs, b_ys, *args, **kwargs))
+            step += 1
+            time_now = time.time()
+            n_samples = len(b_xs)
+            history.append(tuple(results[1:]) + (n_samples / max(time_now - time_last, 1e-9),))
+            time_last = time_now
+            n_log_samples += n_samples
+            if (log_every is not None) and (step % log_every == 0):
+                _log = 'Step: ' + str(step)
+                if steps is not None:
+                    time_remaining, percentage = _get_progress(time_now - time_start, step, steps)
+                    _log = percentage + ' | ETA: ' + str(time_remaining)
+                _log += ' | Cost: ' + str(round(float(np.mean([h[0] for h in history[-log_every:]])), 5))
+                for i, name in enumerate(metric_names):
+                    _log += ' | ' + name + ': ' + \
+                            str(round(float(np.mean([h[i + 1] for h in history[-log_every:]])), 5))
+                _log += ' | ' + str(int(n_log_samples / max(time_now - time_log, 1e-9))) + ' samples/s'
+                if is_prefetcher:
+                    _log += ' | Data wait: ' + str(round(train_data.mean_wait_time * 1000, 2)) + 'ms'
                 _print_log(_log)
-        print('\r')
+                time_log, n_log_samples = time_now, 0
+        if log_every is not None:
+            print('\r')
+        _dtype = [('loss', np.float32)] + [(name, np.float32) for name in metric_names] + \
+                 [('samples_per_sec', np.float32)]
+        return np.array(history, dtype=_dtype)
+
+    def fit_async(self, data, steps, batch_size=50, n_workers=4, shuffle=True, *args, **kwargs):
+        """
+        Hogwild training: n_workers threads run the train op of the shared session at the same
+        time, without any locking of the variables. Each worker takes its own batches from
+        data. This keeps all the cores busy when a single step is too small to parallelize.
+        :param data: tfnn.Data, or a tfnn.Data-like source with batch_iterator(start=)
+        :param steps: the total number of training steps of all the workers
+        :param batch_size: the batch size of every worker
+        :param n_workers: the number of worker threads
+        :param shuffle: every worker reshuffles its data at every epoch. Without shuffling the
+                        workers start at evenly spaced positions of the data
+        :param kwargs: keep_prob or l2_value, as for run_step
+        :return: a dictionary of the statistics, 'n_steps', 'samples_per_sec' of all the workers,
+                and the 'mean_staleness' and 'max_staleness' of the updates. The staleness of
+                an update is the number of updates of the other workers since the worker's last one.
+        """
+        if self.n_micro_batches > 1:
+            raise AttributeError('fit_async does not support gradient accumulation')
+        self._check_init()
+        if not hasattr(self, '_step_after_update'):
+            with tfnn.control_dependencies([self._train_op]):
+                self._step_after_update = tfnn.identity(self.global_step)
+        # the feed constants are added to the graph once, not by the workers at the same time
+        _feed_template = self._get_feed_dict(None, None, *args, **kwargs)
+        steps_per_worker = int(np.ceil(steps / n_workers))
+        staleness = [[] for _ in range(n_workers)]
+        n_samples = [0] * n_workers
+        errors = []
+
+        def _work(worker_id):
+            try:
+                start = 0 if shuffle else worker_id * data.n_samples // n_workers
+                batches = data.batch_iterator(batch_size, shuffle=shuffle, start=start)
+                last_step = None
+                for _ in range(steps_per_worker):
+                    b_xs, b_ys = next(batches)
+                    _feed_dict = dict(_feed_template)
+                    _feed_dict[self.data_placeholder] = self._format_xs(b_xs)
+                    _feed_dict[self.target_placeholder] = self._format_ys(b_ys)
+                    global_step = self.sess.run(self._step_after_update, feed_dict=_feed_dict)
+                    if last_step is not None:
+                        staleness[worker_id].append(global_step - last_step - 1)
+                    last_step = global_step
+                    n_samples[worker_id] += len(b_xs)
+            except Exception as error:
+                errors.append(error)
+
+        workers = [threading.Thread(target=_work, args=(i,)) for i in range(n_workers)]
+        time_start = time.time()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        time_cost = time.time() - time_start
+        if errors:
+            raise errors[0]
+        staleness = np.concatenate([np.asarray(s, dtype=np.int64) for s in staleness])
+        return {'n_steps': steps_per_worker * n_workers,
+                'samples_per_sec': sum(n_samples) / max(time_cost, 1e-9),
+                'mean_staleness': float(staleness.mean()) if staleness.size else 0.,
+                'max_staleness': int(staleness.max()) if staleness.size else 0}
 
     def predict(self, *args, **kwargs):
         raise NotImplementedError("Abstract method")
 
+    def fuse_normalizer(self, normalizer=None):
+        """
+        Load the fitted normalizer config into the graph's center, scale and offset, so the network
+        takes raw features. Only for networks built with normalize_in_graph=True.
+        :param normalizer: a fitted Normalizer, default self.normalizer
+        """
+        if not self.normalize_in_graph:
+            raise AttributeError('The network is not built with normalize_in_graph=True')
+        if normalizer is not None:
+            self.normalizer = normalizer
+        self._fused_normalizer = self.normalizer.get_center_scale_offset()
+        if hasattr(self, 'sess'):
+            self._assign_normalizer()
+
     def save(self, name='new_model', path=None, global_step=None, replace=False):
         if not hasattr(self, '_saver'):
             self._saver = tfnn.NetworkSaver()
         self._saver.save(self, name, path, global_step, replace=replace)
 
     def close(self):
+        self.stop_input_pipeline()
         self.sess.close()
 
     def _add_to_log(self, layer):
@@ -254,21 +701,201 @@ class Network(object):
 
     def _check_init(self):
         if not hasattr(self, '_init'):
-            if not hasattr(self, 'lr'):
-                self.set_learning_rate(0.001)
-            self.optimizer = self._optimizer(self._lr,  *self.optimizer_params[0], **self.optimizer_params[1])
-            with tfnn.name_scope('trian'):
-                self._train_op = self.optimizer.minimize(self.loss, self.global_step, name='train_op')
-            # initialize all variables
-            self._init = tfnn.initialize_all_variables()
-            self.sess = tfnn.Session()
-            self.sess.run(self._init)
+            self._build_train_op()
+            self._make_session()
+
+    def _build_train_op(self):
+        if not hasattr(self, 'lr'):
+            self.set_learning_rate(0.001)
+        self.optimizer = self._optimizer(self._lr,  *self.optimizer_params[0], **self.optimizer_params[1])
+        with tfnn.name_scope('trian'):
+            if self.n_towers > 1:
+                grads, self._train_loss = self._build_towers()
+            else:
+                grads = [(grad, var) for grad, var in self.optimizer.compute_gradients(self.loss)
+                         if grad is not None]
+                self._train_loss = self.loss
+            if self.n_micro_batches > 1:
+                self._train_op = self._build_accumulation(grads)
+            else:
+                self._train_op = self.optimizer.apply_gradients(grads, self.global_step, name='train_op')
+        # initialize all variables
+        self._init = tfnn.initialize_all_variables()
+
+    def _make_session(self):
+        self.sess = self._new_session()
+        self.sess.run(self._init)
+        if hasattr(self, '_fused_normalizer'):
+            self._assign_normalizer()
+
+    def _new_session(self):
+        if self._cpu_set is not None:
+            # pins the calling thread, the threads it starts from now on inherit the cores,
+            # like the pools of the new session below
+            os.sched_setaffinity(0, self._cpu_set)
+        _config = dict(self._session_config)
+        if _config:
+            # otherwise all the sessions of the process share the pools of the first one and
+            # the thread counts of any later session are ignored
+            _config['use_per_session_threads'] = True
+        return tfnn.Session(config=tfnn.ConfigProto(**_config))
+
+    def _connect_inputs(self, xs=None):
+        """
+        The input tensor of the first layer, xs normalized in graph or not.
+        :param xs: default the data_placeholder
+        """
+        if xs is None:
+            xs = self.data_placeholder
+        if not self.normalize_in_graph:
+            return xs
+        with tfnn.name_scope('normalize_inputs'):
+            # subtract first, large centers do not cancel the small spreads
+            return tfnn.add(tfnn.mul(tfnn.sub(xs, self._xs_center), self._xs_scale), self._xs_offset,
+                            name='normalized_inputs')
+
+    def _forward(self, xs):
+        """
+        The layers again on the input xs, built from the variables of the network. Nothing of
+        the network or its layers is changed and no summary is added.
+        :param xs: a batch tensor shaped like the data_placeholder
+        :return: the output tensor of the last layer
+        """
+        keep_prob = self.layers_results['reg_value'] if self.reg == 'dropout' else None
+        outputs = self._connect_inputs(xs)
+        for layer in self.layers_results['Layer'][1:]:
+            outputs = layer.forward(outputs, self.is_training, keep_prob)
+        return outputs
+
+    def _build_towers(self):
+        """
+        :return: [the averaged gradients and variables, the loss of the whole batch]
+        """
+        batch_size = tfnn.shape(self.data_placeholder)[0]
+        tower_grads, tower_losses = [], []
+        for i in range(self.n_towers):
+            start = batch_size * i // self.n_towers
+            stop = batch_size * (i + 1) // self.n_towers
+            with tfnn.name_scope('tower_%i' % i):
+                rows = tfnn.range(start, stop)
+                outputs = self._forward(tfnn.gather(self.data_placeholder, rows))
+                loss = self._compute_loss(outputs, tfnn.gather(self.target_placeholder, rows))
+                # weighted by the tower's share, the sum is the mean over the whole batch
+                weight = tfnn.cast(stop - start, tfnn.float32) / tfnn.cast(batch_size, tfnn.float32)
+                # a batch smaller than n_towers leaves towers empty, their NaN mean loss is dropped
+                non_empty = tfnn.greater(stop, start)
+                grads = [(_weight_or_zero(non_empty, grad, weight), var)
+                         for grad, var in self.optimizer.compute_gradients(loss) if grad is not None]
+            tower_grads.append(grads)
+            tower_losses.append(_weight_or_zero(non_empty, loss, weight))
+        with tfnn.name_scope('average_gradients'):
+            grads = [(tfnn.add_n([tower[k][0] for tower in tower_grads]), tower_grads[0][k][1])
+                     for k in range(len(tower_grads[0]))]
+        return [grads, tfnn.add_n(tower_losses, name='towers_loss')]
+
+    def _build_accumulation(self, grads):
+        """
+        :return: the train op which adds the gradients of one micro-batch to the accumulators
+        """
+        with tfnn.name_scope('accumulate_gradients'):
+            accumulators = [tfnn.Variable(tfnn.zeros(var.get_shape()), trainable=False, name='accumulator')
+                            for _, var in grads]
+            accumulate_op = tfnn.group(
+                *[accumulator.assign_add(grad / self.n_micro_batches)
+                  for accumulator, (grad, _) in zip(accumulators, grads)], name='train_op')
+            apply_op = self.optimizer.apply_gradients(
+                [(accumulator, var) for accumulator, (_, var) in zip(accumulators, grads)], self.global_step)
+            with tfnn.control_dependencies([apply_op]):
+                self._apply_accumulated = tfnn.group(
+                    *[accumulator.assign(tfnn.zeros_like(accumulator)) for accumulator in accumulators],
+                    name='apply_accumulated')
+        self._n_accumulated = 0
+        return accumulate_op
+
+    def _run_train_op(self, fetches, feed_dict):
+        """
+        Run the fetches of a training step, and apply the accumulated gradients after the last
+        micro-batch.
+        """
+        results = self.sess.run(fetches, feed_dict=feed_dict)
+        if self.n_micro_batches > 1:
+            self._n_accumulated += 1
+            if self._n_accumulated == self.n_micro_batches:
+                self.sess.run(self._apply_accumulated)
+                self._n_accumulated = 0
+        return results
+
+    def _build_multi_step(self):
+        with tfnn.name_scope('multi_step'):
+            self._block_xs = tfnn.placeholder(tfnn.float32, shape=[None, self.input_size], name='block_xs')
+            self._block_ys = tfnn.placeholder(self.target_placeholder.dtype,
+                                              shape=self.target_placeholder.get_shape(), name='block_ys')
+            self._block_n_steps = tfnn.placeholder(tfnn.int32, shape=[], name='n_steps')
+            batch_size = tfnn.shape(self._block_xs)[0] // self._block_n_steps
+            # the train op has created the slots of the optimizer, the loop body must not
+            # create variables
+            var_list = [var for var in tfnn.trainable_variables()
+                        if all(self.optimizer.get_slot(var, name) is not None
+                               for name in self.optimizer.get_slot_names())]
+
+            def _step(i, losses):
+                batch = tfnn.range(i * batch_size, (i + 1) * batch_size)
+                outputs = self._forward(tfnn.gather(self._block_xs, batch))
+                loss = self._compute_loss(outputs, tfnn.gather(self._block_ys, batch))
+                grads = [(grad, var) for grad, var in self.optimizer.compute_gradients(loss, var_list)
+                         if grad is not None]
+                train_op = self.optimizer.apply_gradients(grads, self.global_step)
+                with tfnn.control_dependencies([train_op]):
+                    return [i + 1, losses.write(i, loss)]
+
+            # one iteration at a time, every step reads the variables updated by the last one
+            _, losses = tfnn.while_loop(
+                lambda i, losses: i < self._block_n_steps, _step,
+                [tfnn.constant(0), tfnn.TensorArray(tfnn.float32, size=self._block_n_steps)],
+                parallel_iterations=1)
+            self._multi_step_losses = losses.pack()
+
+    def _assign_normalizer(self):
+        center, scale, offset = [value.astype(np.float32) for value in self._fused_normalizer]
+        self.sess.run([self._xs_center.assign(center), self._xs_scale.assign(scale),
+                       self._xs_offset.assign(offset)])
+
+    def _build_target_placeholder(self):
+        return tfnn.placeholder(dtype=tfnn.float32, shape=[None, self.output_size], name='y_input')
+
+    @staticmethod
+    def _format_xs(xs):
+        """
+        Shape the xs as the data_placeholder expects, contiguous float32 so TensorFlow does not
+        convert the feed. Batches from tfnn.Data are already in this form and are not copied.
+        """
+        if np.ndim(xs) == 1:
+            xs = xs[np.newaxis, :]
+        return np.ascontiguousarray(xs, dtype=np.float32)
+
+    def _format_ys(self, ys):
+        """
+        Shape the ys as the target_placeholder expects.
+        """
+        if np.ndim(ys) == 1:
+            ys = ys[np.newaxis, :]
+        return np.ascontiguousarray(ys, dtype=np.float32)
 
     def _init_loss(self):
         """do not use in network.py"""
         self.loss = None
 
     def _get_feed_dict(self, xs, ys, *args, **kwargs):
+        if xs is None:
+            # the batch comes from the input pipeline
+            _feed_dict = {}
+        else:
+            _feed_dict = {
+                self.data_placeholder: self._format_xs(xs),
+                self.target_placeholder: self._format_ys(ys)
+            }
+        # the feeds of the training steps, evaluating and predicting keep the default False
+        _feed_dict[self.is_training] = True
         if self.reg == 'dropout':
             if args:
                 kp = args[0]
@@ -278,11 +905,7 @@ class Network(object):
             if not hasattr(self, '_keep_prob'):
                 self._keep_prob = tfnn.constant(kp)
 
-            _feed_dict = {
-                self.data_placeholder: xs,
-                self.target_placeholder: ys,
-                self.keep_prob_placeholder: kp
-            }
+            _feed_dict[self.keep_prob_placeholder] = kp
         elif self.reg == 'l2':
             if args:
                 l2_value = args[0]
@@ -292,16 +915,7 @@ class Network(object):
             if not hasattr(self, '_l2_value'):
                 self._l2_value = tfnn.constant(l2_value)
 
-            _feed_dict = {
-                self.data_placeholder: xs,
-                self.target_placeholder: ys,
-                self.l2_placeholder: l2_value
-            }
-        else:
-            _feed_dict = {
-                self.data_placeholder: xs,
-                self.target_placeholder: ys
-            }
+            _feed_dict[self.l2_placeholder] = l2_value
         return _feed_dict
 
     def __add__(self, _layers):
@@ -386,3 +1000,6 @@ class Network(object):
             _bshape = self.layers_results['Layer'][1:][n_layer].b.get_shape()
         return _bshape
 
+
+def _weight_or_zero(condition, tensor, weight):
+    return tfnn.cond(condition, lambda: tensor * weight, lambda: tfnn.zeros_like(tensor))
@@ -4,13 +4,21 @@ import numpy as np
 
 
 class ClfNetwork(Network):
-    def __init__(self, input_size, output_size, method='softmax', do_dropout=False, do_l2=False,):
+    def __init__(self, input_size, output_size, method='softmax', do_dropout=False, do_l2=False,
+                 normalize_in_graph=False):
 
-        if method not in ['softmax', 'sigmoid']:
-            raise ValueError("method should be one of ['softmax', 'sigmoid']")
-        super(ClfNetwork, self).__init__(
-            input_size, output_size, do_dropout, do_l2, ntype='CNet')
+        """
+
+        :param method: 'softmax' or 'sigmoid' for one-hot ys. 'sparse_softmax' for ys of integer
+                    class indices, shape(n_samples,) or (n_samples, 1), output_size is the number of classes.
+        """
+        if method not in ['sparse_softmax', 'softmax', 'sigmoid']:
+            raise ValueError("method should be one of ['sparse_softmax', 'softmax', 'sigmoid']")
+        # the target placeholder depends on the method
         self.method = method
+        super(ClfNetwork, self).__init__(
+            input_size, output_size, do_dropout, do_l2, ntype='CNet',
+            normalize_in_graph=normalize_in_graph)
         self.name = 'ClassificationNetwork'
         self._params = {
             'input_size': input_size,
@@ -18,6 +26,7 @@ class ClfNetwork(Network):
             'method': method,
             'do_dropout': do_dropout,
             'do_l2': do_l2,
+            'normalize_in_graph': normalize_in_graph,
         }
         self.layers_configs['params'] = [self._params]
 
@@ -26,49 +35,61 @@ class ClfNetwork(Network):
 
     def _init_loss(self):
         with tfnn.name_scope('predictions'):
-            if self.method == 'softmax':
+            if self.method in ['sparse_softmax', 'softmax']:
                 self.predictions = tfnn.nn.softmax(self.layers_results['final'][-1], name='predictions')
             elif self.method == 'sigmoid':
                 self.predictions = tfnn.nn.sigmoid(self.layers_results['final'][-1], name='predictions')
         with tfnn.name_scope('loss'):
-            if self.method == 'softmax':
-                self.cross_entropy = tfnn.nn.softmax_cross_entropy_with_logits(
-                    self.layers_results['final'][-1],
-                    self.target_placeholder,
-                    name='xentropy')
-            elif self.method == 'sigmoid':
-                self.cross_entropy = tfnn.nn.sigmoid_cross_entropy_with_logits(
-                    self.layers_results['final'][-1],
-                    self.target_placeholder,
-                    name='xentropy')
-            else:
-                raise ValueError("method should be one of ['sparse_softmax', 'softmax', 'sigmoid']")
-            self.loss = tfnn.reduce_mean(self.cross_entropy, name='xentropy_mean')
+            self.loss = self._compute_loss(self.layers_results['final'][-1], self.target_placeholder)
+            tfnn.scalar_summary('loss', self.loss)
 
-            if self.reg == 'l2':
-                with tfnn.name_scope('l2_reg'):
-                    regularizers = 0
-                    for layer in self.layers_results['Layer'][1:]:
-                        regularizers += tfnn.nn.l2_loss(layer.W, name='l2_reg')
-                    regularizers *= self.l2_placeholder
-                with tfnn.name_scope('l2_loss'):
-                    self.loss += regularizers
+    def _compute_loss(self, outputs, targets):
+        """
+        The loss of the last layer's outputs, also used by the replicas of the layers.
+        """
+        if self.method == 'sparse_softmax':
+            cross_entropy = tfnn.nn.sparse_softmax_cross_entropy_with_logits(
+                outputs, targets, name='xentropy')
+        elif self.method == 'softmax':
+            cross_entropy = tfnn.nn.softmax_cross_entropy_with_logits(
+                outputs, targets, name='xentropy')
+        elif self.method == 'sigmoid':
+            cross_entropy = tfnn.nn.sigmoid_cross_entropy_with_logits(
+                outputs, targets, name='xentropy')
+        else:
+            raise ValueError("method should be one of ['sparse_softmax', 'softmax', 'sigmoid']")
+        loss = tfnn.reduce_mean(cross_entropy, name='xentropy_mean')
 
-            tfnn.scalar_summary('loss', self.loss)
+        if self.reg == 'l2':
+            with tfnn.name_scope('l2_reg'):
+                regularizers = 0
+                for layer in self.layers_results['Layer'][1:]:
+                    regularizers += tfnn.nn.l2_loss(layer.W, name='l2_reg')
+                regularizers *= self.l2_placeholder
+            with tfnn.name_scope('l2_loss'):
+                loss += regularizers
+        return loss
+
+    def _build_target_placeholder(self):
+        if self.method == 'sparse_softmax':
+            return tfnn.placeholder(dtype=tfnn.int32, shape=[None], name='y_input')
+        return super(ClfNetwork, self)._build_target_placeholder()
+
+    def _format_ys(self, ys):
+        if self.method == 'sparse_softmax':
+            # (n_samples, 1) class indices from tfnn.Data, a view when ys is contiguous
+            return np.ascontiguousarray(np.reshape(ys, [-1]), dtype=np.int32)
+        return super(ClfNetwork, self)._format_ys(ys)
 
     def predict(self, xs):
-        if np.ndim(xs) == 1:
-            xs = xs[np.newaxis, :]
-        predictions = self.sess.run(self.predictions, feed_dict={self.data_placeholder: xs})
+        predictions = self.sess.run(self.predictions, feed_dict={self.data_placeholder: self._format_xs(xs)})
         predictions = np.argmax(predictions, axis=1)
         if predictions.size == 1:
             predictions = predictions[0][0]
         return predictions
 
     def predict_prob(self, xs):
-        if np.ndim(xs) == 1:
-            xs = xs[np.newaxis, :]
-        predictions = self.sess.run(self.predictions, feed_dict={self.data_placeholder: xs})
+        predictions = self.sess.run(self.predictions, feed_dict={self.data_placeholder: self._format_xs(xs)})
         if predictions.size == 1:
             predictions = predictions[0][0]
         return predictions
\ No newline at end of file
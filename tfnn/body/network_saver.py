@@ -70,7 +70,12 @@ class NetworkSaver(object):
             with open(save_path+'/net_configs.pickle', 'wb') as file:
                 pickle.dump(network_configs, file)
 
-    def restore(self, name='new_model', path=None, checkpoint=None):
+    def restore(self, name='new_model', path=None, checkpoint=None, intra_op_threads=None,
+                inter_op_threads=None, cpu_set=None):
+        """
+        :param intra_op_threads, inter_op_threads, cpu_set: the session config of the restored
+                        network, see Network.set_session_config()
+        """
         if path is None:
             path = '/'
         if path[0] != '/':
@@ -107,13 +112,16 @@ class NetworkSaver(object):
         else:
             do_dropout = False
             do_l2 = True
+        normalize_in_graph = layers_configs['params'][0].get('normalize_in_graph', False)
         # select the type of network
         if net_name == 'RegressionNetwork':
             network = tfnn.RegNetwork(input_size=input_size, output_size=output_size,
-                                      do_dropout=do_dropout, do_l2=do_l2)
+                                      do_dropout=do_dropout, do_l2=do_l2,
+                                      normalize_in_graph=normalize_in_graph)
         else:
             network = tfnn.ClfNetwork(input_size=input_size, output_size=output_size,
-                                      do_dropout=do_dropout, do_l2=do_l2)
+                                      do_dropout=do_dropout, do_l2=do_l2,
+                                      normalize_in_graph=normalize_in_graph)
         # set the data configuration
         if data_config is not None:
             network.normalizer.set_config(data_config)
@@ -131,7 +139,8 @@ class NetworkSaver(object):
                 network.add_output_layer(**params)
             elif layer_type == 'conv':
                 network.add_conv_layer(**params)
-        network.sess = tfnn.Session()
+        network.set_session_config(intra_op_threads, inter_op_threads, cpu_set)
+        network.sess = network._new_session()
         self._network = network
         _saver = tfnn.train.Saver()
         self._network._init = tfnn.initialize_all_variables()
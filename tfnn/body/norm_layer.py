@@ -5,12 +5,14 @@ from tfnn.body.layer import Layer
 class HiddenLayer(Layer):
     def __init__(self,
                  n_neurons, activator=None, dropout_layer=False,
-                 w_initial='xavier', name=None,):
+                 w_initial='xavier', name=None, batch_norm=False,):
         super(HiddenLayer, self).__init__(activator, dropout_layer,
                                           w_initial, name,
                                           layer_type='hidden')
         self.n_neurons = n_neurons
+        self.batch_norm = batch_norm
         self._params['n_neurons'] = self.n_neurons
+        self._params['batch_norm'] = self.batch_norm
 
     def construct(self, layers_configs, layers_results):
         self._construct(self.n_neurons, layers_configs, layers_results)
@@ -36,12 +38,14 @@ class OutputLayer(Layer):
 class FCLayer(Layer):
     def __init__(self,
                  n_neurons, activator=None, dropout_layer=False,
-                 w_initial='xavier', name=None, ):
+                 w_initial='xavier', name=None, batch_norm=False, ):
         super(FCLayer, self).__init__(activator, dropout_layer,
                                       w_initial, name,
                                       layer_type='fc')
         self.n_neurons = n_neurons
+        self.batch_norm = batch_norm
         self._params['n_neurons'] = self.n_neurons
+        self._params['batch_norm'] = self.batch_norm
 
     def construct(self, layers_configs, layers_results):
         if layers_configs['type'][-1] == 'conv':
@@ -59,3 +63,9 @@ class FCLayer(Layer):
             raise TypeError('The first Fully connected layer should followed by a Convolutional layer')
 
         self._construct(self.n_neurons, layers_configs, layers_results)
+
+    def _shape_inputs(self, inputs):
+        if inputs.get_shape().ndims > 2:
+            # flatten the images of the conv layer before
+            return tfnn.reshape(inputs, [-1, self.W.get_shape().as_list()[0]], name='flat4fc')
+        return inputs
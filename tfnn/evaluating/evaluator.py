@@ -61,6 +61,16 @@ class Evaluator(object):
         feed_dict = self.get_feed_dict(xs, ys)
         return self.f1.eval(feed_dict, self.network.sess)
 
+    def reduce_lr_on_plateau(self, xs, ys, metric='cost'):
+        """
+        Compute a validation metric and pass it to network.reduce_lr_on_plateau().
+        :param metric: 'cost' is minimized, the other scores like 'accuracy', 'f1' or 'r2' are maximized
+        :return: the current learning rate
+        """
+        value = self.compute_scores(metric, xs, ys)[0]
+        mode = 'min' if metric.lower() == 'cost' else 'max'
+        return self.network.reduce_lr_on_plateau(value, mode)
+
     def set_scale_monitor(self, objects, figsize=(10, 10), sleep=0.001):
         """
         :param objects: a list. A list like ['cost', 'r2'];
@@ -124,6 +134,7 @@ class Evaluator(object):
             self.line_fitting_monitor.monitoring(t_xs, t_ys)
 
     def get_feed_dict(self, xs, ys):
+        xs, ys = self.network._format_xs(xs), self.network._format_ys(ys)
         if self.network.reg == 'dropout':
             feed_dict = {self.network.data_placeholder: xs,
                          self.network.target_placeholder: ys,
@@ -149,12 +160,18 @@ class Evaluator(object):
             with tfnn.name_scope('accuracy'):
                 correct_prediction = tfnn.equal(
                     tfnn.argmax(self.network.predictions, 1),
-                    tfnn.argmax(self.network.target_placeholder, 1),
+                    self._get_actual_classes(),
                     name='correct_prediction')
                 self.accuracy = tfnn.reduce_mean(
                     tfnn.cast(correct_prediction, tfnn.float32), name='accuracy')
                 tfnn.scalar_summary('accuracy', self.accuracy)
 
+    def _get_actual_classes(self):
+        if self.network.method == 'sparse_softmax':
+            # class indices already
+            return tfnn.cast(self.network.target_placeholder, tfnn.int64)
+        return tfnn.argmax(self.network.target_placeholder, 1)
+
     def _set_r2(self):
         if isinstance(self.network, tfnn.RegNetwork):
             with tfnn.name_scope('r2_score'):
@@ -179,7 +196,7 @@ class Evaluator(object):
         # for onehot data
         with tfnn.name_scope('f1_score'):
             predictions = tfnn.argmax(self.network.predictions, 1)
-            actuals = tfnn.argmax(self.network.target_placeholder, 1)
+            actuals = self._get_actual_classes()
 
             ones_like_actuals = tfnn.ones_like(actuals)
             zeros_like_actuals = tfnn.zeros_like(actuals)
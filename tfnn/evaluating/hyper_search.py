@@ -0,0 +1,179 @@
+import os
+import shutil
+import tempfile
+import itertools
+import multiprocessing
+import numpy as np
+import tfnn
+
+_SPACE_DEFAULTS = {'layers': [[100]], 'activator': ['relu'], 'optimizer': ['adam'], 'learning_rate': [0.001]}
+
+# the shared data sets of a worker process
+_worker_data = {}
+
+
+class HyperSearch(object):
+    def __init__(self, train_data, validate_data, space, network='clf', network_kwargs=None,
+                 train_kwargs=None, metric='cost', n_trials=None, n_workers=None, batch_size=50,
+                 min_steps=200, max_steps=5000, eta=3, seed=None):
+        """
+        Search hyperparameters with successive halving. All the trials train for min_steps,
+        only the best 1/eta of them go on for eta times as many steps, and so on up to max_steps.
+        Every trial builds its own graph in a worker process. The data sets are written once to
+        .npy files which all the workers memory-map read-only, so they share the page cache and
+        do not copy the data. Run it under if __name__ == '__main__':,
+        the workers are spawned.
+        :param train_data: tfnn.Data
+        :param validate_data: tfnn.Data for the metric
+        :param space: a dictionary of the candidates of 'layers' (lists of hidden layer sizes),
+                    'activator', 'optimizer' and 'learning_rate', like
+                    dict(layers=[[100], [200, 100]], activator=['relu', 'tanh'], learning_rate=[0.01, 0.001])
+        :param network: 'clf' for ClfNetwork or 'reg' for RegNetwork
+        :param network_kwargs: the other arguments of the network, like dict(method='sparse_softmax')
+        :param train_kwargs: the arguments of run_step, like dict(keep_prob=0.5)
+        :param metric: the Evaluator score on validate_data, 'cost' is minimized, the others maximized
+        :param n_trials: the number of random combinations from space, default the whole grid
+        :param n_workers: the number of worker processes, default the number of cores
+        :param batch_size: the training batch size
+        :param min_steps: the training steps of the first rung
+        :param max_steps: the most training steps of a trial
+        :param eta: the reduction factor between the rungs
+        :param seed: the seed of the random trials
+        """
+        if network not in ['clf', 'reg']:
+            raise ValueError("network should be one of ['clf', 'reg'], not %s" % network)
+        unknown = set(space.keys()) - set(_SPACE_DEFAULTS.keys())
+        if unknown:
+            raise ValueError('Unknown hyperparameters %s, the space supports %s'
+                             % (sorted(unknown), sorted(_SPACE_DEFAULTS.keys())))
+        if eta < 2:
+            raise ValueError('eta must be at least 2, not %s' % eta)
+        self.train_data = train_data
+        self.validate_data = validate_data
+        self.space = dict(_SPACE_DEFAULTS, **space)
+        self.network = network
+        self.network_kwargs = {} if network_kwargs is None else network_kwargs
+        self.train_kwargs = {} if train_kwargs is None else train_kwargs
+        self.metric = metric.lower()
+        self.n_trials = n_trials
+        self.n_workers = multiprocessing.cpu_count() if n_workers is None else n_workers
+        self.batch_size = batch_size
+        self.min_steps = min_steps
+        self.max_steps = max_steps
+        self.eta = eta
+        self._random = np.random.RandomState(seed)
+        self.leaderboard = None
+
+    def trials(self):
+        """
+        :return: the list of the hyperparameter dictionaries to try
+        """
+        keys = sorted(self.space.keys())
+        if self.n_trials is None:
+            return [dict(zip(keys, values)) for values in itertools.product(*[self.space[k] for k in keys])]
+        return [{key: self.space[key][self._random.randint(len(self.space[key]))] for key in keys}
+                for _ in range(self.n_trials)]
+
+    def run(self):
+        """
+        :return: the leaderboard, a list of dictionaries with the 'params', the 'score' on the
+                validation data and the training 'steps' of every trial, the best first
+        """
+        trials = self.trials()
+        records = [{'params': params, 'score': None, 'steps': 0} for params in trials]
+        checkpoint_dir = tempfile.mkdtemp(prefix='tfnn_search_')
+        specs = {}
+        try:
+            for name, data in [('train', self.train_data), ('validate', self.validate_data)]:
+                specs[name] = []
+                for part, array in [('xs', data.xs), ('ys', data.ys)]:
+                    path = os.path.join(checkpoint_dir, '%s_%s.npy' % (name, part))
+                    np.save(path, np.ascontiguousarray(array))
+                    specs[name].append(path)
+            n_workers = min(self.n_workers, len(trials))
+            config = {'network': self.network, 'network_kwargs': self.network_kwargs,
+                      'train_kwargs': self.train_kwargs, 'metric': self.metric,
+                      'batch_size': self.batch_size, 'dtype': self.train_data.dtype,
+                      'output_size': self._output_size(), 'checkpoint_dir': checkpoint_dir,
+                      'n_workers': n_workers}
+            # spawn, forked workers would inherit the threads of a running TensorFlow
+            context = multiprocessing.get_context('spawn')
+            pool = context.Pool(n_workers, initializer=_init_worker, initargs=(specs,))
+            try:
+                survivors = list(range(len(trials)))
+                steps = min(self.min_steps, self.max_steps)
+                while True:
+                    tasks = [(i, trials[i], records[i]['steps'], steps, config) for i in survivors]
+                    for i, score in pool.imap_unordered(_run_trial, tasks):
+                        records[i]['score'] = score
+                        records[i]['steps'] = steps
+                    if (steps >= self.max_steps) or (len(survivors) <= 1):
+                        break
+                    survivors = self._rank(survivors, records)[:int(np.ceil(len(survivors) / self.eta))]
+                    steps = min(steps * self.eta, self.max_steps)
+            finally:
+                pool.terminate()
+                pool.join()
+        finally:
+            shutil.rmtree(checkpoint_dir, ignore_errors=True)
+        # the trials that went further rank before the ones stopped early
+        self.leaderboard = [records[i] for i in sorted(
+            range(len(records)), key=lambda i: (-records[i]['steps'], self._sort_key(records[i]['score'])))]
+        return self.leaderboard
+
+    def _output_size(self):
+        if (self.network == 'clf') and (self.network_kwargs.get('method') == 'sparse_softmax'):
+            # the number of classes of the integer class indices
+            return int(max(self.train_data.ys.max(), self.validate_data.ys.max())) + 1
+        return self.train_data.n_yfeatures
+
+    def _rank(self, indices, records):
+        return sorted(indices, key=lambda i: self._sort_key(records[i]['score']))
+
+    def _sort_key(self, score):
+        if (score is None) or np.isnan(score):
+            return np.inf
+        return score if self.metric == 'cost' else -score
+
+
+def _init_worker(specs):
+    for name, (xs_path, ys_path) in specs.items():
+        _worker_data[name] = [np.load(xs_path, mmap_mode='r'), np.load(ys_path, mmap_mode='r')]
+
+
+def _run_trial(task):
+    """
+    Train one trial from its last checkpoint up to steps in a new graph.
+    :return: [the trial index, the validation score]
+    """
+    index, params, done_steps, steps, config = task
+    train_xs, train_ys = _worker_data['train']
+    validate_xs, validate_ys = _worker_data['validate']
+    train_data = tfnn.Data(train_xs, train_ys, dtype=config['dtype'])
+    checkpoint_path = os.path.join(config['checkpoint_dir'], 'trial_%i' % index)
+    with tfnn.Graph().as_default():
+        if config['network'] == 'clf':
+            network = tfnn.ClfNetwork(train_data.n_xfeatures, config['output_size'], **config['network_kwargs'])
+        else:
+            network = tfnn.RegNetwork(train_data.n_xfeatures, config['output_size'], **config['network_kwargs'])
+        for n_neurons in params['layers']:
+            network.add_hidden_layer(n_neurons, activator=params['activator'])
+        network.add_output_layer()
+        network.set_optimizer(params['optimizer'])
+        network.set_learning_rate(params['learning_rate'])
+        # the workers share the cores, each TensorFlow would otherwise start one thread per core
+        network.set_session_config(intra_op_threads=max(1, multiprocessing.cpu_count() // config['n_workers']),
+                                   inter_op_threads=1)
+        network._check_init()
+        saver = tfnn.train.Saver()
+        if done_steps > 0:
+            saver.restore(network.sess, checkpoint_path)
+        batches = train_data.batch_iterator(config['batch_size'], shuffle=True)
+        for _ in range(steps - done_steps):
+            b_xs, b_ys = next(batches)
+            network.run_step(b_xs, b_ys, **config['train_kwargs'])
+        evaluator = tfnn.Evaluator(network)
+        score = float(evaluator.compute_scores(config['metric'], validate_xs, validate_ys)[0])
+        saver.save(network.sess, checkpoint_path)
+        network.close()
+    return [index, score]
@@ -61,6 +61,7 @@ class Summarizer(object):
             os.system('tensorboard --logdir=%s' % path)
 
     def _get_feed_dict(self, xs, ys, *args):
+        xs, ys = self._network._format_xs(xs), self._network._format_ys(ys)
         if self._network.reg == 'dropout':
             feed_dict = {self._network.data_placeholder: xs,
                          self._network.target_placeholder: ys,
@@ -0,0 +1,83 @@
+import numpy as np
+
+
+class BatchIterator(object):
+    def __init__(self, data, batch_size, shuffle=False, reuse_buffers=True, start=0):
+        """
+        Epoch-aware batch iterator over a tfnn.Data.
+        A batch that does not cross the end of an epoch and is not shuffled is a contiguous
+        slice of the data, so no copy is made. Other batches are gathered into output buffers
+        which are allocated once and reused by every following batch.
+        :param data: tfnn.Data or MemmapData
+        :param batch_size: number of samples in each batch
+        :param shuffle: True to visit the samples in a new random order every epoch
+        :param reuse_buffers: if True, the returned arrays may be overwritten by the next batch,
+                        copy them if they have to be kept.
+        :param start: the position in the first epoch's order of the first batch, the first
+                        epoch ends after the last sample as usual
+        """
+        self.data = data
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.reuse_buffers = reuse_buffers
+        self.epoch = 0
+        self._cursor = start % data.n_samples
+        self._order = np.random.permutation(data.n_samples) if shuffle else None
+        self._indices_buffer = None
+        self._out_buffers = None
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return self.next_batch()
+
+    next = __next__     # python 2
+
+    def next_batch(self):
+        """
+        :return: [xs, ys] of the next batch_size samples
+        """
+        n_samples = self.data.n_samples
+        start, stop = self._cursor, self._cursor + self.batch_size
+        if (self._order is None) and (stop <= n_samples):
+            self._cursor = stop
+            if self._cursor == n_samples:
+                self._next_epoch()
+            return self.data.take(slice(start, stop))
+
+        indices = self._fill_indices(n_samples)
+        if self.reuse_buffers:
+            return self.data.take(indices, out=self._get_out_buffers())
+        return self.data.take(indices)
+
+    def _fill_indices(self, n_samples):
+        if (self._indices_buffer is None) or (self._indices_buffer.shape[0] != self.batch_size):
+            self._indices_buffer = np.empty(self.batch_size, dtype=np.int64)
+        filled = 0
+        while filled < self.batch_size:
+            n_take = min(self.batch_size - filled, n_samples - self._cursor)
+            _piece = self._indices_buffer[filled:filled + n_take]
+            if self._order is None:
+                _piece[:] = np.arange(self._cursor, self._cursor + n_take)
+            else:
+                _piece[:] = self._order[self._cursor:self._cursor + n_take]
+            filled += n_take
+            self._cursor += n_take
+            if self._cursor == n_samples:
+                self._next_epoch()
+        return self._indices_buffer
+
+    def _next_epoch(self):
+        self.epoch += 1
+        self._cursor = 0
+        if self.shuffle:
+            self._order = np.random.permutation(self.data.n_samples)
+
+    def _get_out_buffers(self):
+        if (self._out_buffers is None) or (self._out_buffers[0].shape[0] != self.batch_size):
+            # the first gathered batch decides the buffers' shapes and dtypes
+            xs, ys = self.data.take(self._indices_buffer[:1])
+            self._out_buffers = [np.empty((self.batch_size,) + xs.shape[1:], dtype=xs.dtype),
+                                 np.empty((self.batch_size,) + ys.shape[1:], dtype=ys.dtype)]
+        return self._out_buffers
@@ -4,18 +4,26 @@ import copy
 from tfnn.preprocessing.shuffle import shuffle as datasets_shuffle
 from tfnn.preprocessing.train_test_split import train_test_split as datasets_train_test_split
 from tfnn.preprocessing.onehot_encode import onehot_encode as datasets_onehot_encode
+from tfnn.preprocessing.onehot_encode import index_encode as datasets_index_encode
 from tfnn.preprocessing.encoder import BinaryEncoder
 from tfnn.preprocessing.sampled_batch import sampled_batch as datasets_sampled_batch
 from tfnn.preprocessing.plot_feature_utility import plot_feature_utility as datasets_plot_feature_utility
 from tfnn.preprocessing.next_batch import next_batch as datasets_next_batch
+from tfnn.preprocessing.batch_iterator import BatchIterator
+from tfnn.preprocessing.sum_tree import SumTree
+from tfnn.preprocessing.k_fold import k_fold as datasets_k_fold
 
 
 class Data:
-    def __init__(self, xs, ys, name=None):
+    def __init__(self, xs, ys, name=None, dtype=np.float32):
         """
-        Input data sets.
+        Input data sets. xs and ys are stored as two separate C-contiguous arrays, each one
+        keeps its own dtype. Numpy inputs which are already contiguous are not copied.
         :param xs: data, shape(n_samples, n_xs), accept numpy, pandas, list
         :param ys: labels, shape(n_samples, n_ys), accept numpy, pandas, list
+        :param dtype: the compute dtype of the network placeholders. Floating xs and ys are stored
+                    in it, other xs (like uint8 images) are stored as they are and converted batch
+                    by batch, integer ys (class indices) are kept. None keeps all dtypes.
         """
         if (type(xs).__module__ == np.__name__) & (type(ys).__module__ == np.__name__):
             self.module = 'numpy_data'
@@ -25,31 +33,82 @@ class Data:
             xs, ys = np.asarray(xs), np.asarray(ys)
         else:
             raise TypeError('all data type must be numpy or pandas')
-        if ys.ndim < 2:
-            ys = ys[:, np.newaxis]
+        if xs.shape[0] != ys.shape[0]:
+            raise ValueError('xs and ys must have the same number of samples, %i != %i'
+                             % (xs.shape[0], ys.shape[0]))
+        self.dtype = dtype
+        self.xs = xs
+        self.ys = ys
+        self.name = name
+
+    @property
+    def xs(self):
+        return self._xs
+
+    @xs.setter
+    def xs(self, xs):
+        xs = np.ascontiguousarray(xs, dtype=self._storage_dtype(xs))  # no copy if nothing changes
         if xs.ndim < 2:
             xs = xs[:, np.newaxis]
-
+        self._xs = xs
         self.n_xfeatures = xs.shape[-1]     # col for 2 dims, channel for 3 dims
+
+    @property
+    def ys(self):
+        return self._ys
+
+    @ys.setter
+    def ys(self, ys):
+        ys = np.ascontiguousarray(ys, dtype=self._storage_dtype(ys))
+        if ys.ndim < 2:
+            ys = ys[:, np.newaxis]
+        self._ys = ys
         self.n_yfeatures = ys.shape[-1]     # col for 2 dims,
-        self.data = np.hstack((xs, ys))
-        self.n_samples = ys.shape[0]
-        self.name = name
 
     @property
-    def xs(self):
-        return self.data[:, :self.n_xfeatures]
+    def n_samples(self):
+        return self._ys.shape[0]
 
     @property
-    def ys(self):
-        return self.data[:, self.n_xfeatures:]
+    def data(self):
+        """
+        A hstacked copy of xs and ys, only kept for backward compatibility.
+        """
+        return np.hstack((self._xs, self._ys))
+
+    def take(self, indices, out=None):
+        """
+        Gather the samples at the given positions.
+        :param indices: 1-D integer array of sample positions, or a slice which returns views
+        :param out: optional [xs_buffer, ys_buffer] to gather the samples into
+        :return: [xs, ys]
+        """
+        if (out is None) or isinstance(indices, slice):
+            return [self._to_compute_dtype(self._xs[indices]), self._ys[indices]]
+        if out[0].dtype == self._xs.dtype:
+            # mode='clip' lets numpy write straight into out without an extra buffer
+            np.take(self._xs, indices, axis=0, out=out[0], mode='clip')
+        else:
+            out[0][...] = self._xs[indices]
+        np.take(self._ys, indices, axis=0, out=out[1], mode='clip')
+        return out
+
+    def _storage_dtype(self, array):
+        array_dtype = np.asarray(array).dtype
+        if (self.dtype is not None) and np.issubdtype(array_dtype, np.floating):
+            return self.dtype
+        return array_dtype
+
+    def _to_compute_dtype(self, xs):
+        if (self.dtype is None) or (xs.dtype == self.dtype):
+            return xs
+        return xs.astype(self.dtype)
 
     def shuffle(self, inplace=False):
-        _shuffled_data = datasets_shuffle(self)
         if inplace:
-            self.data = _shuffled_data.data
+            self.xs, self.ys = self.take(np.random.permutation(self.n_samples))
         else:
-            return _shuffled_data
+            return datasets_shuffle(self)
 
     def onehot_encode_y(self, inplace=False):
         """
@@ -57,32 +116,81 @@ class Data:
         :param inplace: True of False
         :return:
         """
-        _ys = datasets_onehot_encode(self.ys, inplace)
-        data_copy = self.data.copy()
-        data_copy = np.delete(data_copy, self.n_xfeatures, axis=1)
-        data_copy = np.insert(data_copy, [self.n_xfeatures], _ys, axis=1)
+        _ys = datasets_onehot_encode(self.ys[:, 0])
+        if inplace:
+            self.ys = _ys
+        else:
+            return Data(self.xs, _ys, self.name, self.dtype)
+
+    def index_encode_y(self, inplace=False):
+        """
+        Encode the categorical target data as int32 class indices, for
+        ClfNetwork(method='sparse_softmax'). It costs 1/n_classes of the one-hot memory.
+        :param inplace: True of False
+        :return:
+        """
+        _ys = datasets_index_encode(self.ys[:, 0])
         if inplace:
-            self.data = data_copy
+            self.ys = _ys
         else:
-            _xs = data_copy[:, :self.n_xfeatures]
-            _ys = data_copy[:, self.n_xfeatures:]
-            return Data(_xs, _ys)
+            return Data(self.xs, _ys, self.name, self.dtype)
 
-    def sampled_batch(self, batch_size, replace=False, p=None):
+    def sampled_batch(self, batch_size, replace=False, p=None, return_indices=False):
         """
 
         :param batch_size:
         :param replace: Allow replacements in sampled data
         :param p : 1-D array-like, optional
                 The probabilities associated with each entry in a.
-                If not given the sample assumes a uniform distribution over all entries in a.
+                If not given the sample assumes a uniform distribution over all entries in a,
+                or the priorities from set_priorities() when they are set, which are always
+                sampled with replacement.
+        :param return_indices: also return the positions of the samples, [xs, ys, indices]
         :return:
         """
-        return datasets_sampled_batch(self, batch_size, replace, p)
+        return datasets_sampled_batch(self, batch_size, replace, p, return_indices)
+
+    def set_priorities(self, priorities):
+        """
+        Sample the batches of sampled_batch() in proportion to these priorities, for example
+        per-sample losses for hard example mining. Set None to go back to uniform sampling.
+        :param priorities: 1-D non-negative weights, one for each sample
+        """
+        if priorities is None:
+            self._sum_tree = None
+            return
+        if len(priorities) != self.n_samples:
+            raise ValueError('Need one priority for each of the %i samples' % self.n_samples)
+        self._sum_tree = SumTree(priorities)
+
+    def update_priorities(self, indices, priorities):
+        """
+        :param indices: sample positions, like the ones returned by sampled_batch(return_indices=True)
+        :param priorities: the new priorities of these samples
+        """
+        if getattr(self, '_sum_tree', None) is None:
+            raise AttributeError('Set the priorities of all samples with set_priorities() first')
+        self._sum_tree.update(indices, priorities)
 
     def next_batch(self, batch_size):
+        """
+        Samples are taken in order and wrap around at the end of the data.
+        The returned arrays may be reused by the next call, copy them if they have to be kept.
+        :param batch_size:
+        :return: [xs, ys]
+        """
         return datasets_next_batch(self, batch_size)
 
+    def batch_iterator(self, batch_size, shuffle=False, reuse_buffers=True, start=0):
+        """
+        :param batch_size:
+        :param shuffle: reshuffle the samples at the start of every epoch
+        :param reuse_buffers: gather the batches into the same preallocated arrays
+        :param start: the position of the first batch in the first epoch
+        :return: BatchIterator
+        """
+        return BatchIterator(self, batch_size, shuffle, reuse_buffers, start)
+
     def plot_feature_utility(self, n_feature):
         """
         This function is to check the categorical feature utility for machine learning BEFORE BINARIZE.
@@ -96,9 +204,18 @@ class Data:
         t_data, v_data = datasets_train_test_split(self, train_rate, randomly)
         return [t_data, v_data]
 
+    def k_fold(self, n_folds=5, stratified=True, randomly=True):
+        """
+        K-fold cross validation without copying the data.
+        :param n_folds: number of folds
+        :param stratified: keep the class proportions of ys in every fold
+        :param randomly: shuffle the samples before splitting
+        :return: generator of [train_view, validate_view]
+        """
+        return datasets_k_fold(self, n_folds, stratified, randomly)
+
     def copy(self):
-        deep_copy = copy.deepcopy([self.xs, self.ys, self.name])
-        return Data(*deep_copy)
+        return Data(self.xs.copy(), self.ys.copy(), copy.copy(self.name), self.dtype)
 
 if __name__ == "__main__":
     import pandas as pd
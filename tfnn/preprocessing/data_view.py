@@ -0,0 +1,94 @@
+import numpy as np
+from tfnn.preprocessing.data import Data
+
+
+class DataView(Data):
+    def __init__(self, parent, indices, name=None):
+        """
+        A lightweight subset of a tfnn.Data. It only holds an index array into the parent,
+        the rows are gathered when a batch is taken. Setting xs or ys, like the in-place
+        normalizing or encoding does, turns the view into a plain data set owning its rows.
+        :param parent: tfnn.Data, MemmapData or DataView
+        :param indices: 1-D integer array of the parent's sample positions
+        :param name:
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        if isinstance(parent, DataView) and (parent.parent is not None):
+            # point straight at the root data, views of views do not chain lookups
+            indices = parent.indices[indices]
+            parent = parent.parent
+        self.parent = parent
+        self.indices = indices
+        self.n_xfeatures = parent.n_xfeatures
+        self.n_yfeatures = parent.n_yfeatures
+        self.dtype = parent.dtype
+        self.name = name
+        self._gathered = None
+
+    @property
+    def xs(self):
+        """
+        Gathers all the rows of this view once, use take() or next_batch() for batches.
+        """
+        if self.parent is None:
+            return self._xs
+        return self._gather_all()[0]
+
+    @xs.setter
+    def xs(self, xs):
+        self._materialize()
+        Data.xs.fset(self, xs)
+
+    @property
+    def ys(self):
+        if self.parent is None:
+            return self._ys
+        return self._gather_all()[1]
+
+    @ys.setter
+    def ys(self, ys):
+        self._materialize()
+        Data.ys.fset(self, ys)
+
+    @property
+    def n_samples(self):
+        if self.parent is None:
+            return self._ys.shape[0]
+        return self.indices.shape[0]
+
+    def take(self, indices, out=None):
+        if self.parent is None:
+            return super(DataView, self).take(indices, out)
+        return self.parent.take(self.indices[indices], out)
+
+    def shuffle(self, inplace=False):
+        if self.parent is None:
+            return super(DataView, self).shuffle(inplace)
+        if inplace:
+            self.indices = self.indices[np.random.permutation(self.n_samples)]
+            self._gathered = None
+        else:
+            return DataView(self, np.random.permutation(self.n_samples), self.name)
+
+    def copy(self):
+        """
+        :return: a tfnn.Data which owns the gathered rows of this view
+        """
+        xs, ys = self.take(np.arange(self.n_samples))
+        return Data(xs, ys, self.name, self.dtype)
+
+    def _gather_all(self):
+        # the whole view is gathered at most once, repeated validation reads reuse it
+        if self._gathered is None:
+            self._gathered = self.parent.take(self.indices)
+        return self._gathered
+
+    def _materialize(self):
+        """
+        Own the rows of the view, so xs and ys can be replaced.
+        """
+        if self.parent is not None:
+            xs, ys = self._gather_all()
+            self.parent, self.indices, self._gathered = None, None, None
+            Data.xs.fset(self, xs)
+            Data.ys.fset(self, ys)
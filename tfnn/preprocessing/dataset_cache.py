@@ -0,0 +1,139 @@
+import os
+import json
+import shutil
+import pickle
+import hashlib
+import tempfile
+import numpy as np
+from tfnn.preprocessing.memmap_data import MemmapData
+from tfnn.preprocessing.normalizer import Normalizer
+
+
+class DatasetCache(object):
+    def __init__(self, cache_dir, by_content=True):
+        """
+        Cache the results of a preprocessing pipeline as .npy files plus the normalizer config.
+        A later run with the same source files and parameters memory-maps the cached arrays
+        instead of repeating the loading, encoding, normalizing and splitting.
+        :param cache_dir: the directory of the cache
+        :param by_content: hash the bytes of the source files, otherwise only their path, size and
+                        modification time, which is faster for very large files
+        """
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+        self.cache_dir = cache_dir
+        self.by_content = by_content
+
+    def key(self, source, params=None):
+        """
+        :param source: a file path or a list of file paths
+        :param params: a dictionary of the preprocessing parameters, JSON serializable, numpy arrays,
+                    numpy scalars or sets. Other objects raise TypeError, their repr is not stable
+                    enough for a key
+        :return: hex digest
+        """
+        if isinstance(source, str):
+            source = [source]
+        _hash = hashlib.sha1()
+        for path in source:
+            _hash.update(os.path.abspath(path).encode('utf-8'))
+            if self.by_content:
+                with open(path, 'rb') as file:
+                    for block in iter(lambda: file.read(1 << 20), b''):
+                        _hash.update(block)
+            else:
+                _stat = os.stat(path)
+                _hash.update(('%i-%f' % (_stat.st_size, _stat.st_mtime)).encode('utf-8'))
+        _hash.update(json.dumps(params, sort_keys=True, default=_canonical).encode('utf-8'))
+        return _hash.hexdigest()
+
+    def load_or_build(self, source, build, params=None):
+        """
+        :param source: the source file path(s) of the pipeline
+        :param build: function() which runs the pipeline and returns a tfnn.Data, a list of them
+                    like the result of train_test_split, or a dictionary of {name: tfnn.Data},
+                    optionally together with the fitted Normalizer as [datasets, normalizer]
+        :param params: the preprocessing parameters, part of the cache key
+        :return: the datasets as MemmapData, in the same structure build returns them, and the
+                Normalizer when build returns one
+        """
+        cache_path = os.path.join(self.cache_dir, self.key(source, params))
+        if not os.path.isdir(cache_path):
+            self._save(cache_path, build())
+        return self._load(cache_path)
+
+    def clear(self):
+        for entry in os.listdir(self.cache_dir):
+            shutil.rmtree(os.path.join(self.cache_dir, entry), ignore_errors=True)
+
+    @staticmethod
+    def _save(cache_path, result):
+        if isinstance(result, (list, tuple)) and (len(result) == 2) and isinstance(result[-1], Normalizer):
+            datasets, normalizer = result
+        else:
+            datasets, normalizer = result, None
+        if isinstance(datasets, dict):
+            structure = 'dict'
+        elif isinstance(datasets, (list, tuple)):
+            structure = 'list'
+            datasets = {str(i): data for i, data in enumerate(datasets)}
+        else:
+            structure = 'single'
+            datasets = {'data': datasets}
+        # write into a temporary directory first, a crashed build never leaves a broken entry
+        tmp_path = tempfile.mkdtemp(dir=os.path.dirname(cache_path))
+        try:
+            for name, data in datasets.items():
+                MemmapData.from_data(data, os.path.join(tmp_path, name + '_xs.npy'),
+                                     os.path.join(tmp_path, name + '_ys.npy'))
+            meta = {'names': {name: data.name for name, data in datasets.items()},
+                    'dtypes': {name: data.dtype for name, data in datasets.items()},
+                    'structure': structure,
+                    'with_normalizer': normalizer is not None,
+                    'normalizer_config': None if normalizer is None else normalizer.config}
+            with open(os.path.join(tmp_path, 'meta.pickle'), 'wb') as file:
+                pickle.dump(meta, file)
+        except Exception:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            raise
+        try:
+            os.rename(tmp_path, cache_path)
+        except OSError:
+            # another process has cached the same pipeline meanwhile
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            if not os.path.isdir(cache_path):
+                raise
+
+    @staticmethod
+    def _load(cache_path):
+        with open(os.path.join(cache_path, 'meta.pickle'), 'rb') as file:
+            meta = pickle.load(file)
+        datasets = {}
+        for name, data_name in meta['names'].items():
+            datasets[name] = MemmapData(os.path.join(cache_path, name + '_xs.npy'),
+                                        os.path.join(cache_path, name + '_ys.npy'),
+                                        name=data_name, dtype=meta['dtypes'][name])
+        structure = meta['structure']
+        if structure == 'single':
+            datasets = datasets['data']
+        elif structure == 'list':
+            datasets = [datasets[str(i)] for i in range(len(datasets))]
+        if not meta['with_normalizer']:
+            return datasets
+        normalizer = Normalizer()
+        if meta['normalizer_config'] is not None:
+            normalizer.set_config(meta['normalizer_config'])
+        return [datasets, normalizer]
+
+
+def _canonical(obj):
+    # repr abbreviates large arrays, hash all their bytes instead
+    if isinstance(obj, np.ndarray):
+        _hash = hashlib.sha1(np.ascontiguousarray(obj).tobytes())
+        _hash.update(('%s-%s' % (obj.dtype.str, obj.shape)).encode('utf-8'))
+        return 'ndarray-' + _hash.hexdigest()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, (set, frozenset)):
+        return sorted(obj)
+    raise TypeError('%r cannot be part of a cache key, pass its parameters instead' % (obj,))
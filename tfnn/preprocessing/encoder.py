@@ -45,6 +45,80 @@ class BinaryEncoder(object):
         return one_hot
 
 
+class HashingEncoder(object):
+    def __init__(self, n_buckets=1024, columns=None, signed=True, dtype=np.float32):
+        """
+        Feature hashing for high-cardinality categorical columns. Every value is hashed into one
+        of n_buckets columns, so the output width does not grow with the number of categories and
+        no vocabulary is kept. The encoding is stateless, chunks of a stream can be encoded one by one.
+        :param n_buckets: number of output columns for all the hashed columns together
+        :param columns: the columns to hash, names for DataFrames, positions for numpy arrays.
+                    The other columns are kept as numeric features in front of the buckets.
+                    Default hash all columns.
+        :param signed: add +1 or -1 by another bit of the hash, so the collisions cancel out on average
+        :param dtype: dtype of the output
+        """
+        self.n_buckets = n_buckets
+        self.columns = columns
+        self.signed = signed
+        self.dtype = dtype
+
+    def transform(self, xs):
+        """
+        :param xs: pandas DataFrame or 2-D numpy array
+        :return: numpy array, shape(n_samples, n_kept_columns + n_buckets)
+        """
+        frame = xs if isinstance(xs, pd.DataFrame) else pd.DataFrame(np.asarray(xs))
+        if self.columns is None:
+            hashed_columns = list(frame.columns)
+        elif isinstance(xs, pd.DataFrame):
+            hashed_columns = list(self.columns)
+        else:
+            hashed_columns = [frame.columns[c] for c in self.columns]
+        kept_columns = [c for c in frame.columns if c not in hashed_columns]
+
+        n_samples = frame.shape[0]
+        flat_index = np.empty(n_samples * len(hashed_columns), dtype=np.int64)
+        weights = np.ones(flat_index.shape[0], dtype=np.float64)
+        rows = np.arange(n_samples, dtype=np.int64) * self.n_buckets
+        for i, column in enumerate(hashed_columns):
+            # salt with the column name, the same value in two columns is a different feature
+            salt = pd.util.hash_array(np.array([str(column)], dtype=object))[0]
+            hashes = pd.util.hash_array(frame[column].values) ^ salt
+            hashes = hashes * np.uint64(0x9E3779B97F4A7C15)     # mix the bits again after the xor
+            _slice = slice(i * n_samples, (i + 1) * n_samples)
+            flat_index[_slice] = rows + (hashes % np.uint64(self.n_buckets)).astype(np.int64)
+            if self.signed:
+                weights[_slice] = np.where(hashes >> np.uint64(63), -1., 1.)
+        hashed = np.bincount(flat_index, weights=weights, minlength=n_samples * self.n_buckets)
+        hashed = hashed.reshape((n_samples, self.n_buckets)).astype(self.dtype)
+        if not kept_columns:
+            return hashed
+        return np.hstack((frame[kept_columns].values.astype(self.dtype), hashed))
+
+    def transform_chunks(self, chunks):
+        """
+        :param chunks: an iterable of DataFrames or arrays, like pandas.read_csv(chunksize=...)
+        :return: generator of the encoded chunks
+        """
+        for chunk in chunks:
+            yield self.transform(chunk)
+
+    def encode_data(self, data, inplace=False):
+        """
+        Hash the categorical feature data of a tfnn.Data.
+        :param data:
+        :param inplace:
+        :return:
+        """
+        result = self.transform(data.xs)
+        if inplace:
+            data.xs = result
+            return None
+        else:
+            return result
+
+
 if __name__ == '__main__':
     def numpy_1_of_k(seq):
         unique_num, indices= np.unique(seq, return_inverse=True)
@@ -0,0 +1,100 @@
+import os
+import gzip
+import shutil
+import numpy as np
+from urllib.request import urlopen
+from tfnn.preprocessing.memmap_data import MemmapData
+
+# the same files as the tensorflow tutorial loader
+MNIST_URL = 'https://storage.googleapis.com/cvdf-datasets/mnist/'
+
+# the third byte of the IDX magic number gives the data type
+_IDX_DTYPES = {0x08: np.uint8, 0x09: np.int8, 0x0B: np.dtype('>i2'),
+               0x0C: np.dtype('>i4'), 0x0D: np.dtype('>f4'), 0x0E: np.dtype('>f8')}
+
+
+def read_idx(path, cache_dir=None):
+    """
+    Read an IDX file, gzipped or not, as a read-only memory map. The file is decompressed once
+    into a .npy file, later calls only map it.
+    :param path: path of the IDX file, like 'MNIST_data/train-images-idx3-ubyte.gz'
+    :param cache_dir: where to keep the .npy file, default next to the IDX file
+    :return: np.memmap in the shape given by the IDX header
+    """
+    if not os.path.isfile(path):
+        raise FileNotFoundError('IDX file does not exist: %s' % path)
+    file_name = os.path.basename(path)
+    if file_name.endswith('.gz'):
+        file_name = file_name[:-3]
+    npy_path = os.path.join(cache_dir if cache_dir is not None else os.path.dirname(path), file_name + '.npy')
+    if not os.path.isfile(npy_path):
+        _idx_to_npy(path, npy_path)
+    return np.load(npy_path, mmap_mode='r')
+
+
+def _idx_to_npy(path, npy_path, block_size=1 << 24):
+    _open = gzip.open if path.endswith('.gz') else open
+    with _open(path, 'rb') as file:
+        magic = bytearray(file.read(4))
+        if (magic[0] != 0) or (magic[1] != 0) or (magic[2] not in _IDX_DTYPES):
+            raise ValueError('%s is not an IDX file' % path)
+        idx_dtype = np.dtype(_IDX_DTYPES[magic[2]])
+        shape = tuple(int(d) for d in np.frombuffer(file.read(4 * magic[3]), dtype='>u4'))
+        tmp_path = npy_path + '.tmp'
+        array = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=idx_dtype.newbyteorder('='),
+                                          shape=shape)
+        flat = array.reshape(-1)
+        # decompress block by block straight into the .npy file
+        n_items = block_size // idx_dtype.itemsize
+        for start in range(0, flat.shape[0], n_items):
+            stop = min(start + n_items, flat.shape[0])
+            block = file.read((stop - start) * idx_dtype.itemsize)
+            flat[start:stop] = np.frombuffer(block, dtype=idx_dtype)
+        array.flush()
+        del flat, array
+    os.rename(tmp_path, npy_path)
+
+
+def load_mnist(path='MNIST_data', kind='train', one_hot=False, cache_dir=None, download=True):
+    """
+    MNIST images as a MemmapData of the raw uint8 pixels, 1/4 of the float32 memory. Batches
+    are converted to float32 and scaled to [0, 1] when they are taken.
+    :param path: the directory of the gzipped IDX files
+    :param kind: 'train' or 't10k'
+    :param one_hot: one-hot float32 labels, otherwise uint8 class indices for
+                ClfNetwork(method='sparse_softmax')
+    :param cache_dir: where to keep the decompressed .npy files, default path
+    :param download: download the missing gzipped files from MNIST_URL into path
+    :return: MemmapData, xs shape(n_samples, 784)
+    """
+    if kind not in ['train', 't10k']:
+        raise ValueError("kind should be one of ['train', 't10k'], not %s" % kind)
+    images_path = os.path.join(path, '%s-images-idx3-ubyte.gz' % kind)
+    labels_path = os.path.join(path, '%s-labels-idx1-ubyte.gz' % kind)
+    if download:
+        _maybe_download(images_path)
+        _maybe_download(labels_path)
+    images = read_idx(images_path, cache_dir)
+    labels = read_idx(labels_path, cache_dir)
+    images = images.reshape((images.shape[0], -1))      # still a memory map, nothing is read
+    if one_hot:
+        one_hot_labels = np.zeros((labels.shape[0], int(labels.max()) + 1), dtype=np.float32)
+        one_hot_labels[np.arange(labels.shape[0]), labels] = 1
+        labels = one_hot_labels
+    return MemmapData(images, labels, name=kind, xs_scale=1. / 255)
+
+
+def _maybe_download(path):
+    if os.path.isfile(path):
+        return
+    directory = os.path.dirname(path)
+    if directory and not os.path.isdir(directory):
+        os.makedirs(directory)
+    tmp_path = path + '.download'
+    response = urlopen(MNIST_URL + os.path.basename(path))
+    try:
+        with open(tmp_path, 'wb') as file:
+            shutil.copyfileobj(response, file)
+    finally:
+        response.close()
+    os.rename(tmp_path, path)
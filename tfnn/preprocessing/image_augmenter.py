@@ -0,0 +1,104 @@
+import numpy as np
+
+
+class ImageAugmenter(object):
+    def __init__(self, image_shape, flip_lr=True, flip_ud=False, max_shift=0, crop_scale=None,
+                 noise_std=0., value_range=None, seed=None):
+        """
+        Random augmentation of whole NHWC batches. Crops, translations and flips of all the images
+        are done by one fancy-indexing gather, the noise by one vectorized add, there is no loop
+        over the images. Use it as the transform of a Prefetcher, so the batches are augmented on
+        the worker threads while the network trains:
+            augmenter = ImageAugmenter.from_network(network, max_shift=2)
+            prefetcher = tfnn.Prefetcher(train_data, 100, transform=augmenter, n_workers=2)
+        :param image_shape: (length, width, channels), the image_shape given to add_conv_layer
+        :param flip_lr: randomly mirror half of the images left to right
+        :param flip_ud: randomly mirror half of the images upside down
+        :param max_shift: the maximum translation in pixels, an int or (max_x, max_y).
+                        The uncovered pixels are 0.
+        :param crop_scale: None, or the smallest side of a random crop as a fraction of the image
+                        side, like 0.8. The crop is resized back to image_shape by nearest neighbour.
+        :param noise_std: the standard deviation of the additive gaussian noise, 0 for none
+        :param value_range: None, or (min, max) to clip the pixels to after the noise. None clips
+                        integer images to the range of their dtype.
+        :param seed: the seed of the augmenter's random state
+        """
+        if isinstance(image_shape, (tuple, list)) and len(image_shape) == 3:
+            self.image_shape = tuple(int(s) for s in image_shape)
+        else:
+            raise ValueError('image_shape must be (length, width, channels), not %s' % (image_shape,))
+        if isinstance(max_shift, int):
+            max_shift = (max_shift, max_shift)
+        if (crop_scale is not None) and not (0 < crop_scale <= 1):
+            raise ValueError('crop_scale must be in (0, 1], not %s' % crop_scale)
+        self.flip_lr = flip_lr
+        self.flip_ud = flip_ud
+        self.max_shift = tuple(max_shift)
+        self.crop_scale = crop_scale
+        self.noise_std = noise_std
+        self.value_range = value_range
+        self._random = np.random.RandomState(seed)
+
+    @classmethod
+    def from_network(cls, network, **kwargs):
+        """
+        :param network: a network with a conv layer, the image_shape of its first conv layer is used
+        :param kwargs: the other arguments of ImageAugmenter
+        :return: ImageAugmenter
+        """
+        for layer_type, params in zip(network.layers_configs['type'], network.layers_configs['params']):
+            if layer_type == 'conv' and params.get('image_shape') is not None:
+                return cls(params['image_shape'], **kwargs)
+        raise ValueError('The network has no conv layer with an image_shape')
+
+    def __call__(self, xs, ys):
+        return [self.augment(xs), ys]
+
+    def augment(self, xs):
+        """
+        :param xs: a batch of images, flat shape(n_samples, length*width*channels) as fed to the
+                network, or shape(n_samples, length, width, channels)
+        :return: the augmented batch, a new array of the same shape and dtype
+        """
+        xs = np.asarray(xs)
+        images = xs.reshape((-1,) + self.image_shape)
+        n_samples, length, width, _ = images.shape
+        rows, row_valid = self._sample_axis(n_samples, length, self.max_shift[0], self.flip_ud)
+        cols, col_valid = self._sample_axis(n_samples, width, self.max_shift[1], self.flip_lr)
+        augmented = images[np.arange(n_samples)[:, None, None], rows[:, :, None], cols[:, None, :]]
+        if not (row_valid.all() and col_valid.all()):
+            augmented *= (row_valid[:, :, None] & col_valid[:, None, :])[:, :, :, None]
+        if self.noise_std > 0:
+            noise = self._random.normal(0., self.noise_std, augmented.shape)
+            if np.issubdtype(augmented.dtype, np.floating):
+                augmented += noise.astype(augmented.dtype)
+            else:
+                augmented = augmented + noise
+        if self.value_range is not None:
+            np.clip(augmented, self.value_range[0], self.value_range[1], out=augmented)
+        elif np.issubdtype(xs.dtype, np.integer):
+            # the noisy float pixels would wrap around in the cast back, like 256 -> 0 for uint8
+            np.clip(augmented, np.iinfo(xs.dtype).min, np.iinfo(xs.dtype).max, out=augmented)
+        return augmented.astype(xs.dtype, copy=False).reshape(xs.shape)
+
+    def _sample_axis(self, n_samples, size, max_shift, flip):
+        """
+        The source pixel positions along one image axis, for all the images at once.
+        :return: [int64 positions shape(n_samples, size), bool mask of the positions inside the image]
+        """
+        positions = np.arange(size, dtype=np.float64)[None, :]
+        if self.crop_scale is not None:
+            crop_size = np.round(size * self._random.uniform(self.crop_scale, 1., n_samples)).astype(np.int64)
+            start = (self._random.random_sample(n_samples) * (size - crop_size + 1)).astype(np.int64)
+            # nearest neighbour resize of the crop back to the full size
+            positions = start[:, None] + np.floor(positions * (crop_size[:, None] / size))
+        else:
+            positions = np.repeat(positions, n_samples, axis=0)
+        if flip:
+            flipped = self._random.random_sample(n_samples) < 0.5
+            positions[flipped] = positions[flipped, ::-1]
+        if max_shift > 0:
+            positions -= self._random.randint(-max_shift, max_shift + 1, n_samples)[:, None]
+        positions = positions.astype(np.int64)
+        valid = (positions >= 0) & (positions < size)
+        return [np.clip(positions, 0, size - 1), valid]
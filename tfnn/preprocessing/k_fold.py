@@ -0,0 +1,31 @@
+import tfnn
+import numpy as np
+
+
+def k_fold(data, n_folds=5, stratified=True, randomly=True):
+    """
+    K-fold cross validation splits as index views, the data is never copied.
+    :param data: tfnn.Data
+    :param n_folds: number of folds
+    :param stratified: keep the class proportions of ys in every fold. One-hot ys are
+                    read by argmax, single column ys by their value.
+    :param randomly: shuffle the samples before dealing them into folds
+    :return: generator of [train_view, validate_view], one pair for each fold
+    """
+    n_samples = data.n_samples
+    if n_folds < 2 or n_folds > n_samples:
+        raise ValueError('n_folds must be between 2 and the number of samples, not %i' % n_folds)
+    order = np.random.permutation(n_samples) if randomly else np.arange(n_samples)
+    if stratified:
+        ys = data.ys
+        labels = ys.argmax(axis=1) if ys.shape[1] > 1 else ys[:, 0]
+        # a stable sort groups the classes and keeps the random order inside each class,
+        # then the samples are dealt to the folds in turn
+        order = order[np.argsort(labels[order], kind='mergesort')]
+    fold_of_sample = np.empty(n_samples, dtype=np.int64)
+    fold_of_sample[order] = np.arange(n_samples) % n_folds
+    for fold in range(n_folds):
+        train_indices = np.flatnonzero(fold_of_sample != fold)
+        test_indices = np.flatnonzero(fold_of_sample == fold)
+        yield [tfnn.DataView(data, train_indices, name='train'),
+               tfnn.DataView(data, test_indices, name='validate')]
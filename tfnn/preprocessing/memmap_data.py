@@ -0,0 +1,172 @@
+import numpy as np
+from tfnn.preprocessing.data import Data
+
+
+class MemmapData(Data):
+    def __init__(self, xs, ys, name=None, mmap_mode='r', indices=None, dtype=np.float32, xs_scale=None):
+        """
+        Out-of-core data sets. xs and ys stay on disk as memory-mapped arrays, only the rows
+        of a batch are read. shuffle and train_test_split work on a permutation of row
+        indices, so the files are never loaded as a whole. xs and ys cannot be replaced, so
+        in-place operations like Normalizer.minmax(data, inplace=True) raise an AttributeError;
+        use inplace=False, or fit a Normalizer and transform the batches.
+        :param xs: path to a .npy file, or a np.memmap, shape(n_samples, n_xs)
+        :param ys: path to a .npy file, or a np.memmap, shape(n_samples, n_ys)
+        :param mmap_mode: the mode to open .npy files, 'r' for read-only
+        :param indices: the rows of the files in this data set, default all rows in order
+        :param dtype: the compute dtype, the batches of xs and floating ys are converted to it
+        :param xs_scale: multiply the batches of xs by it after the conversion, so compact storage
+                    like uint8 pixels with xs_scale=1/255 is only scaled batch by batch
+        """
+        if (xs_scale is not None) and (dtype is None):
+            raise ValueError('xs_scale needs a floating compute dtype')
+        self._xs = self._open(xs, mmap_mode)
+        self._ys = self._open(ys, mmap_mode)
+        if self._xs.shape[0] != self._ys.shape[0]:
+            raise ValueError('xs and ys must have the same number of samples, %i != %i'
+                             % (self._xs.shape[0], self._ys.shape[0]))
+        self.n_xfeatures = self._xs.shape[-1] if self._xs.ndim > 1 else 1
+        self.n_yfeatures = self._ys.shape[-1] if self._ys.ndim > 1 else 1
+        self._indices = None if indices is None else np.asarray(indices, dtype=np.int64)
+        self.mmap_mode = mmap_mode
+        self.dtype = dtype
+        self.xs_scale = xs_scale
+        self.name = name
+
+    @staticmethod
+    def _open(array, mmap_mode):
+        if isinstance(array, str):
+            return np.load(array, mmap_mode=mmap_mode)
+        elif isinstance(array, np.ndarray):
+            return array
+        else:
+            raise TypeError('MemmapData only accepts .npy paths or numpy memmaps, not %s' % type(array))
+
+    @classmethod
+    def from_data(cls, data, xs_path, ys_path, name=None):
+        """
+        Write an in-memory Data to two .npy files and open them as MemmapData.
+        :param data: tfnn.Data
+        :param xs_path: .npy file for xs
+        :param ys_path: .npy file for ys
+        :return: MemmapData
+        """
+        np.save(xs_path, data.xs)
+        np.save(ys_path, data.ys)
+        return cls(xs_path, ys_path, name=name if name is not None else data.name, dtype=data.dtype)
+
+    def _scale_xs(self, xs):
+        if self.xs_scale is not None:
+            xs *= self.xs_scale
+        return xs
+
+    @property
+    def xs(self):
+        """
+        Reads all the rows of this data set into memory, use take() or next_batch() for batches.
+        """
+        return self._scale_xs(self._gather(self._xs, self._file_rows(np.arange(self.n_samples)), self._xs_dtype))
+
+    @xs.setter
+    def xs(self, xs):
+        self._read_only()
+
+    @property
+    def ys(self):
+        return self._gather(self._ys, self._file_rows(np.arange(self.n_samples)), self._ys_dtype)
+
+    @ys.setter
+    def ys(self, ys):
+        self._read_only()
+
+    def _read_only(self):
+        raise AttributeError('MemmapData %s is backed by files and cannot be modified in place, '
+                             'use inplace=False or write a new data set with MemmapData.from_data()'
+                             % self.name)
+
+    @property
+    def n_samples(self):
+        if self._indices is None:
+            return self._xs.shape[0]
+        return self._indices.shape[0]
+
+    @property
+    def _xs_dtype(self):
+        return self._xs.dtype if self.dtype is None else self.dtype
+
+    @property
+    def _ys_dtype(self):
+        return self._storage_dtype(self._ys)
+
+    def take(self, indices, out=None):
+        if isinstance(indices, slice) and (self._indices is None):
+            # a contiguous block of the files, read straight from the page cache
+            if self.xs_scale is None:
+                xs = self._as_2d(np.asarray(self._xs[indices], dtype=self._xs_dtype))
+            else:
+                xs = self._as_2d(np.multiply(self._xs[indices], self.xs_scale, dtype=self._xs_dtype))
+            ys = self._as_2d(np.asarray(self._ys[indices], dtype=self._ys_dtype))
+            if out is not None:
+                out[0][...] = xs
+                out[1][...] = ys
+                return out
+            return [xs, ys]
+        if isinstance(indices, slice):
+            positions = np.arange(*indices.indices(self.n_samples))
+        else:
+            # only the batch positions, never an index array over the whole file
+            positions = np.asarray(indices, dtype=np.int64)
+        rows = self._file_rows(positions)
+        if out is None:
+            return [self._scale_xs(self._gather(self._xs, rows, self._xs_dtype)),
+                    self._gather(self._ys, rows, self._ys_dtype)]
+        self._scale_xs(self._gather(self._xs, rows, out[0].dtype, out[0]))
+        self._gather(self._ys, rows, out[1].dtype, out[1])
+        return out
+
+    @classmethod
+    def _gather(cls, array, rows, dtype, out=None):
+        # read the pages in file order, then put the rows back in the requested order
+        order = np.argsort(rows, kind='mergesort')
+        if out is None:
+            out = np.empty((rows.shape[0],) + array.shape[1:], dtype=dtype)
+        out = cls._as_2d(out)
+        out[order] = cls._as_2d(array[rows[order]])
+        return out
+
+    @staticmethod
+    def _as_2d(array):
+        if array.ndim < 2:
+            return array[:, np.newaxis]
+        return array
+
+    def shuffle(self, inplace=False):
+        _indices = self._file_rows(np.random.permutation(self.n_samples))
+        if inplace:
+            self._indices = _indices
+        else:
+            return self._subset(_indices, self.name)
+
+    def train_test_split(self, train_rate=0.7, randomly=True):
+        _n_train_samples = int(self.n_samples * train_rate)
+        if randomly:
+            positions = np.random.permutation(self.n_samples)
+        else:
+            positions = np.arange(self.n_samples)
+        rows = self._file_rows(positions)
+        t_data = self._subset(rows[:_n_train_samples], 'train')
+        v_data = self._subset(rows[_n_train_samples:], 'validate')
+        return [t_data, v_data]
+
+    def copy(self):
+        _indices = None if self._indices is None else self._indices.copy()
+        return self._subset(_indices, self.name)
+
+    def _file_rows(self, positions):
+        if self._indices is None:
+            return positions
+        return self._indices[positions]
+
+    def _subset(self, indices, name):
+        return MemmapData(self._xs, self._ys, name=name, mmap_mode=self.mmap_mode, indices=indices,
+                          dtype=self.dtype, xs_scale=self.xs_scale)
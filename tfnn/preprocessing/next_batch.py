@@ -1,11 +1,9 @@
-import numpy as np
+from tfnn.preprocessing.batch_iterator import BatchIterator
 
 
 def next_batch(data, batch_size):
-    if not hasattr(data, '_batch_loop_counter'):
-        data._batch_loop_counter = 0
+    if getattr(data, '_batch_iterator', None) is None:
+        data._batch_iterator = BatchIterator(data, batch_size)
     else:
-        data._batch_loop_counter += 1
-    indices = np.arange(data._batch_loop_counter*batch_size,
-                        (data._batch_loop_counter+1)*batch_size) % data.n_samples
-    return [data.xs[indices, :], data.ys[indices, :]]
+        data._batch_iterator.batch_size = batch_size
+    return data._batch_iterator.next_batch()
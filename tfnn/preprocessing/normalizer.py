@@ -1,3 +1,4 @@
+import tfnn
 import numpy as np
 
 
@@ -5,6 +6,7 @@ class Normalizer(object):
     def __init__(self):
         self.config_exist = False
         self.config = None
+        self.stats = None
 
     def set_config(self, data_config):
         self.config = data_config
@@ -21,27 +23,172 @@ class Normalizer(object):
         elif self.method == 'std':
             self.xs_mean = data_config['xs_mean']
             self.xs_std = data_config['xs_std']
-            self.mean = data_config['mean']
-            self.std = data_config['std']
+            # not self.mean and self.std, they would hide the mean() and std() methods
+            self.target_mean = data_config['mean']
+            self.target_std = data_config['std']
+        if 'stats' in data_config:
+            # a restored streaming normalizer can keep on fitting
+            self.stats = data_config['stats']
         self.config_exist = True
 
+    def transform(self, xs):
+        """
+        Normalize xs with the current config.
+        :param xs:
+        :return: normalized xs
+        """
+        return self.fit_transform(xs)
+
+    def partial_fit(self, xs, method=None, **kwargs):
+        """
+        Update the running min, max, mean and variance with one chunk of xs, and reset the
+        config of the method from them. The statistics are merged with Chan's parallel
+        algorithm, so chunks can come in any order and size.
+        :param xs: a chunk of xs, or a tfnn.Data
+        :param method: 'minmax', 'mean' or 'std', default the method of the current config, or 'std'
+        :param kwargs: lower_bound and upper_bound for 'minmax', mean and std for 'std', default
+                    the ones of the current config
+        :return: self
+        """
+        if hasattr(xs, 'n_xfeatures'):
+            xs = xs.xs
+        xs = np.asarray(xs, dtype=np.float64)
+        if xs.ndim < 2:
+            xs = xs[np.newaxis, :]
+        if xs.shape[0] == 0:
+            return self
+        chunk_mean = xs.mean(axis=0)
+        chunk_stats = {'n_samples': xs.shape[0],
+                       'mean': chunk_mean,
+                       'm2': np.square(xs - chunk_mean).sum(axis=0),
+                       'min': xs.min(axis=0),
+                       'max': xs.max(axis=0)}
+        method, kwargs = self._fit_params(method, kwargs)
+        self.stats = self._merge_stats(self.stats, chunk_stats)
+        self._config_from_stats(method, **kwargs)
+        return self
+
+    def fit(self, chunks, method=None, **kwargs):
+        """
+        Fit the statistics in one streaming pass.
+        :param chunks: an iterable of xs chunks or [xs, ys] batches, like StreamData.batches()
+        :param method: 'minmax', 'mean' or 'std', default as in partial_fit()
+        :return: self
+        """
+        self.stats = None
+        for chunk in chunks:
+            if isinstance(chunk, (list, tuple)):
+                chunk = chunk[0]
+            self.partial_fit(chunk, method, **kwargs)
+        return self
+
+    def merge(self, other, method=None, **kwargs):
+        """
+        Merge the statistics fitted by another Normalizer, for example in a worker process.
+        :param other: Normalizer, or its stats dictionary
+        :param method: 'minmax', 'mean' or 'std', default the method of this config, else the
+                    one of other, or 'std'
+        :return: self
+        """
+        other_stats = other.stats if isinstance(other, Normalizer) else other
+        if other_stats is None:
+            return self
+        if (method is None) and (not self.config_exist) and isinstance(other, Normalizer):
+            method, kwargs = other._fit_params(method, kwargs)
+        method, kwargs = self._fit_params(method, kwargs)
+        self.stats = self._merge_stats(self.stats, other_stats)
+        self._config_from_stats(method, **kwargs)
+        return self
+
+    def _fit_params(self, method, kwargs):
+        """
+        The method and its kwargs of the current config, overridden by the ones given.
+        """
+        if method is None:
+            method = self.method if self.config_exist else 'std'
+        params = {}
+        if self.config_exist and (method == self.method):
+            if method == 'minmax':
+                params = {'lower_bound': self.lower_bound, 'upper_bound': self.upper_bound}
+            elif method == 'std':
+                params = {'mean': self.target_mean, 'std': self.target_std}
+        params.update(kwargs)
+        return [method, params]
+
+    @staticmethod
+    def _merge_stats(stats_a, stats_b):
+        if stats_a is None:
+            return dict(stats_b)
+        n_a, n_b = stats_a['n_samples'], stats_b['n_samples']
+        n = n_a + n_b
+        delta = stats_b['mean'] - stats_a['mean']
+        return {'n_samples': n,
+                'mean': stats_a['mean'] + delta * (n_b / n),
+                'm2': stats_a['m2'] + stats_b['m2'] + np.square(delta) * (n_a * n_b / n),
+                'min': np.minimum(stats_a['min'], stats_b['min']),
+                'max': np.maximum(stats_a['max'], stats_b['max'])}
+
+    def _config_from_stats(self, method, **kwargs):
+        stats = self.stats
+        if method == 'minmax':
+            config = {'normalize_method': 'minmax', 'xs_max': stats['max'], 'xs_min': stats['min'],
+                      'lower_bound': kwargs.get('lower_bound', -1),
+                      'upper_bound': kwargs.get('upper_bound', 1)}
+        elif method == 'mean':
+            config = {'normalize_method': 'mean', 'xs_max': stats['max'], 'xs_min': stats['min'],
+                      'mean': stats['mean']}
+        elif method == 'std':
+            config = {'normalize_method': 'std', 'xs_mean': stats['mean'],
+                      'xs_std': np.sqrt(stats['m2'] / stats['n_samples']),
+                      'mean': kwargs.get('mean', 0), 'std': kwargs.get('std', 1)}
+        else:
+            raise ValueError("method should be one of ['minmax', 'mean', 'std'], not %s" % method)
+        config['stats'] = stats
+        self.set_config(config)
+
+    def get_center_scale_offset(self):
+        """
+        The config as normalized xs = (xs - center) * scale + offset. The center is subtracted
+        first, so features with a large mean and a small spread do not cancel. Features whose
+        normalization divides by zero get scale and offset 0, like the NaN handling of fit_transform.
+        :return: [center, scale, offset], float64 arrays of shape (n_xfeatures,)
+        """
+        if not self.config_exist:
+            raise AttributeError('Have not set normalizer config')
+        if self.method == 'minmax':
+            _range = np.asarray(self.xs_max - self.xs_min, dtype=np.float64)
+            factor, offset = (self.upper_bound - self.lower_bound), self.lower_bound
+            center = self.xs_min
+        elif self.method == 'mean':
+            _range = np.asarray(self.xs_max - self.xs_min, dtype=np.float64)
+            factor, offset = 1., 0.
+            center = self.xs_mean
+        else:
+            _range = np.asarray(self.xs_std, dtype=np.float64)
+            factor, offset = self.target_std, self.target_mean
+            center = self.xs_mean
+        valid = _range != 0
+        scale = np.where(valid, factor / np.where(valid, _range, 1.), 0.)
+        offset = np.where(valid, offset, 0.)
+        center = np.broadcast_to(np.asarray(center, dtype=np.float64), scale.shape)
+        return [center, scale, offset]
+
     def fit_transform(self, xs):
         """
         When having instant test, use fit_transform to normalize one sample xs data
         :param xs:
-        :return: normalized xs
+        :return: normalized xs, in the dtype of floating xs, otherwise float32
         """
         if self.config_exist:
-            if self.method == 'minmax':
-                n_xs = (self.upper_bound - self.lower_bound) * (xs - self.xs_min) \
-                     / (self.xs_max - self.xs_min) + self.lower_bound
-                n_xs[np.isnan(n_xs)] = 0
-            elif self.method == 'mean':
-                n_xs = (xs - self.xs_mean) / (self.xs_max - self.xs_min)
-                n_xs[np.isnan(n_xs)] = 0
-            elif self.method == 'std':
-                n_xs = (xs - self.xs_mean) * (self.std / self.xs_std) + self.mean
-                n_xs[np.isnan(n_xs)] = 0
+            xs = np.asarray(xs)
+            dtype = xs.dtype if np.issubdtype(xs.dtype, np.floating) else np.float32
+            center, scale, offset = self.get_center_scale_offset()
+            # subtract, scale and shift in the output dtype, no float64 temporaries
+            n_xs = np.subtract(xs, center.astype(dtype), dtype=dtype)
+            n_xs *= scale.astype(dtype)
+            n_xs += offset.astype(dtype)
+            # missing values in xs become 0, as before the affine form
+            n_xs[np.isnan(n_xs)] = 0
             return n_xs
         else:
             raise AttributeError('Have not set normalizer config')
@@ -52,34 +199,30 @@ class Normalizer(object):
         config = {'normalize_method': 'minmax', 'xs_max': xs_max, 'xs_min': xs_min,
                   "lower_bound": lower_bound, 'upper_bound': upper_bound}
         self.set_config(config)
-        xs = (self.upper_bound - self.lower_bound) * (data.xs - self.xs_min) \
-             / (self.xs_max - self.xs_min) + self.lower_bound
-        xs[np.isnan(xs)] = 0
+        xs = self.fit_transform(data.xs)
         return self._check_inplace(data, xs, inplace)
 
     def std(self, data, mean=0, std=1, inplace=False):
-        xs_mean = np.mean(data.xs, axis=0)
-        xs_std = np.std(data.xs, axis=0)
+        xs_mean = np.mean(data.xs, axis=0, dtype=np.float64)
+        xs_std = np.std(data.xs, axis=0, dtype=np.float64)
         config = {'normalize_method': 'std', 'xs_mean': xs_mean, 'xs_std': xs_std, 'mean': mean, 'std': std}
         self.set_config(config)
-        xs = (data.xs - self.xs_mean) * (self.std / self.xs_std) + self.mean
+        xs = self.fit_transform(data.xs)
         return self._check_inplace(data, xs, inplace)
 
     def mean(self, data, inplace=False):
-        xs_mean = np.mean(data.xs, axis=0)
+        xs_mean = np.mean(data.xs, axis=0, dtype=np.float64)
         # ys_mean = np.mean(data.ys, axis=1)[:, np.newaxis]
         xs_max = np.max(data.xs, axis=0)
         xs_min = np.min(data.xs, axis=0)
         config = {'normalize_method': 'mean', 'xs_max': xs_max, 'xs_min': xs_min, 'mean': xs_mean}
         self.set_config(config)
-        xs = (data.xs - self.xs_mean) / (self.xs_max - self.xs_min)
-        xs[np.isnan(xs)] = 0
+        xs = self.fit_transform(data.xs)
         return self._check_inplace(data, xs, inplace)
 
     def _check_inplace(self, data, xs, inplace):
         if inplace:
-            data.data[:, :data.n_xfeatures] = xs
+            data.xs = xs
         else:
-            norm_data = data.copy()
-            norm_data.data[:, :norm_data.n_xfeatures] = xs
-            return norm_data
\ No newline at end of file
+            # the ys are shared with the original data, only the normalized xs are new
+            return tfnn.Data(xs, data.ys, data.name, data.dtype)
\ No newline at end of file
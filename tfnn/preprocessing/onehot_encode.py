@@ -14,3 +14,14 @@ def _onehot_seq(seq, k_1=False):
     one_hot = np.zeros((n_samples, n_classes))
     one_hot[np.arange(n_samples), indices] = 1
     return one_hot
+
+
+def index_encode(seqs):
+    """
+    Map the categorical labels to integer class indices 0...n_classes-1, the compact
+    alternative to one-hot labels for ClfNetwork(method='sparse_softmax').
+    :param seqs: 1-D labels
+    :return: int32 class indices, shape(n_samples,)
+    """
+    unique_num, indices = np.unique(seqs, return_inverse=True)
+    return indices.astype(np.int32).reshape(-1)
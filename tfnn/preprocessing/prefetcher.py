@@ -0,0 +1,130 @@
+import threading
+import time
+import queue
+import numpy as np
+
+
+class Prefetcher(object):
+    def __init__(self, source, batch_size=None, n_prefetch=2, transform=None,
+                 n_workers=1, shuffle=False):
+        """
+        Prepare the next batches on worker threads while the network is training.
+        :param source: tfnn.Data, or any iterator or generator which yields [xs, ys]
+        :param batch_size: batch size, only used when the source is a tfnn.Data
+        :param n_prefetch: the maximum number of ready batches waiting in the queue
+        :param transform: optional function(xs, ys) -> [xs, ys] applied on the worker threads,
+                        like normalization or augmentation
+        :param n_workers: number of worker threads, with more than one the batch order is not kept
+        :param shuffle: reshuffle a tfnn.Data source at every epoch
+        """
+        if hasattr(source, 'batch_iterator'):
+            if batch_size is None:
+                raise ValueError('batch_size is required when the source is a tfnn.Data')
+            # batches wait in the queue, so they must not share the iterator's buffers
+            self._source = source.batch_iterator(batch_size, shuffle=shuffle, reuse_buffers=False)
+            # a tfnn.Data source repeats its epochs and never runs out
+            self.source_n_samples = source.n_samples
+        else:
+            self._source = iter(source)
+            self.source_n_samples = None
+        self.batch_size = batch_size
+        self.transform = transform
+        self.wait_times = []
+        self._queue = queue.Queue(maxsize=n_prefetch)
+        self._source_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._n_running = n_workers
+        self._exhausted = False
+        self._workers = []
+        for _ in range(n_workers):
+            worker = threading.Thread(target=self._work)
+            worker.daemon = True
+            worker.start()
+            self._workers.append(worker)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return self.next_batch()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def next_batch(self, batch_size=None):
+        """
+        Block until a batch is ready. The waiting time is appended to wait_times.
+        :param batch_size: only for the same interface as tfnn.Data, must be None or the
+                        batch_size given to the Prefetcher
+        :return: [xs, ys]
+        """
+        if (batch_size is not None) and (self.batch_size is not None) and (batch_size != self.batch_size):
+            raise ValueError('This Prefetcher produces batches of %i samples, not %i'
+                             % (self.batch_size, batch_size))
+        if self._exhausted:
+            # the workers have finished, the queue would block forever
+            raise StopIteration
+        t_start = time.time()
+        while True:
+            try:
+                item = self._queue.get(timeout=0.1)
+            except queue.Empty:
+                # closed from another thread while waiting
+                if self._exhausted:
+                    raise StopIteration
+                continue
+            if isinstance(item, BaseException):
+                self.close()
+                raise item
+            if item is StopIteration:
+                self._n_running -= 1
+                if self._n_running == 0:
+                    self._exhausted = True
+                    raise StopIteration
+                continue
+            break
+        self.wait_times.append(time.time() - t_start)
+        return item
+
+    @property
+    def last_wait_time(self):
+        return self.wait_times[-1] if self.wait_times else 0.
+
+    @property
+    def mean_wait_time(self):
+        return float(np.mean(self.wait_times)) if self.wait_times else 0.
+
+    def close(self):
+        self._stop_event.set()
+        # the stopped workers queue nothing more, next_batch() must not wait for them
+        self._exhausted = True
+        # unblock the workers waiting on a full queue
+        while not self._queue.empty():
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                break
+
+    def _work(self):
+        while not self._stop_event.is_set():
+            try:
+                with self._source_lock:
+                    xs, ys = next(self._source)
+                if self.transform is not None:
+                    xs, ys = self.transform(xs, ys)
+                item = [xs, ys]
+            except StopIteration:
+                item = StopIteration
+            except Exception as error:
+                item = error
+            while not self._stop_event.is_set():
+                try:
+                    self._queue.put(item, timeout=0.1)
+                    break
+                except queue.Full:
+                    continue
+            if not isinstance(item, list):
+                return
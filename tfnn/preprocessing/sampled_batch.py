@@ -1,7 +1,7 @@
 import numpy as np
 
 
-def sampled_batch(data, batch_size, replace=False, p=None):
+def sampled_batch(data, batch_size, replace=False, p=None, return_indices=False):
     """
 
     :param data:
@@ -10,8 +10,15 @@ def sampled_batch(data, batch_size, replace=False, p=None):
     :param p : 1-D array-like, optional
                 The probabilities associated with each entry in a.
                 If not given the sample assumes a uniform distribution over all entries in a.
+    :param return_indices: also return the sample positions, to update their priorities
     :return:
     """
-    _sampled_batch = data.data[np.random.choice(data.data.shape[0], batch_size, replace=replace, p=p), :]
-
-    return [_sampled_batch[:, :data.n_xfeatures], _sampled_batch[:, data.n_xfeatures:]]
+    sum_tree = getattr(data, '_sum_tree', None)
+    if (p is None) and (sum_tree is not None):
+        # O(batch_size * log n) draws from the priorities set by Data.set_priorities
+        indices = sum_tree.sample(batch_size)
+    else:
+        indices = np.random.choice(data.n_samples, batch_size, replace=replace, p=p)
+    if return_indices:
+        return data.take(indices) + [indices]
+    return data.take(indices)
@@ -1,7 +1,8 @@
+import tfnn
 import numpy as np
 
 
 def shuffle(data):
-    shuffled_data = data.copy()
-    np.random.shuffle(shuffled_data.data)
-    return shuffled_data
\ No newline at end of file
+    # a view of permuted row indices, the rows are gathered at batch time
+    shuffled_data = tfnn.DataView(data, np.random.permutation(data.n_samples), data.name)
+    return shuffled_data
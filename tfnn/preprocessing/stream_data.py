@@ -0,0 +1,126 @@
+import numpy as np
+import pandas as pd
+
+
+class StreamData(object):
+    def __init__(self, paths, y_columns, chunk_size=10000, dtype=np.float32, ys_dtype=None,
+                 loop=True, name=None, **csv_kwargs):
+        """
+        Stream large CSV or .npy files into the training loop chunk by chunk.
+        Only one chunk is held in memory, so the peak memory depends on chunk_size, not on
+        the size of the files.
+        :param paths: a file path or a list of file paths, .csv or .npy (2-D, xs and ys side by side)
+        :param y_columns: the columns of ys, names or positions for CSV files, positions for .npy files
+        :param chunk_size: number of rows read at once
+        :param dtype: dtype of the xs batches
+        :param ys_dtype: dtype of the ys batches, default the same as dtype
+        :param loop: start again from the first file after the last one, otherwise
+                    next_batch raises StopIteration at the end
+        :param csv_kwargs: passed to pandas.read_csv
+        """
+        if isinstance(paths, str):
+            paths = [paths]
+        if isinstance(y_columns, (str, int)):
+            y_columns = [y_columns]
+        self.paths = list(paths)
+        self.y_columns = list(y_columns)
+        self.chunk_size = chunk_size
+        self.dtype = dtype
+        self.ys_dtype = dtype if ys_dtype is None else ys_dtype
+        self.loop = loop
+        self.name = name
+        self.epoch = 0
+        self._csv_kwargs = csv_kwargs
+        self._chunks = None
+        self._exhausted = False
+        self._xs_chunk, self._ys_chunk = None, None
+        self._cursor = 0
+
+    def __iter__(self):
+        return self.batches(self.chunk_size)
+
+    def batches(self, batch_size):
+        """
+        :param batch_size:
+        :return: generator of [xs, ys], can be used as the source of a tfnn.Prefetcher
+        """
+        while True:
+            try:
+                yield self.next_batch(batch_size)
+            except StopIteration:
+                return
+
+    @property
+    def n_samples(self):
+        """
+        Only known without reading the files when all of them are .npy files.
+        """
+        if not all(path.endswith('.npy') for path in self.paths):
+            raise AttributeError('The number of samples in CSV files is unknown, set the training steps.')
+        return sum(np.load(path, mmap_mode='r').shape[0] for path in self.paths)
+
+    def next_batch(self, batch_size):
+        xs_pieces, ys_pieces = [], []
+        n_filled = 0
+        while n_filled < batch_size:
+            if (self._xs_chunk is None) or (self._cursor == self._xs_chunk.shape[0]):
+                try:
+                    self._read_chunk()
+                except StopIteration:
+                    if n_filled == 0:
+                        raise
+                    break   # the last, smaller batch
+            n_take = min(batch_size - n_filled, self._xs_chunk.shape[0] - self._cursor)
+            xs_pieces.append(self._xs_chunk[self._cursor:self._cursor + n_take])
+            ys_pieces.append(self._ys_chunk[self._cursor:self._cursor + n_take])
+            self._cursor += n_take
+            n_filled += n_take
+        if len(xs_pieces) == 1:
+            # the whole batch is inside one chunk, return views
+            return [xs_pieces[0], ys_pieces[0]]
+        return [np.concatenate(xs_pieces), np.concatenate(ys_pieces)]
+
+    def reset(self):
+        """
+        Start again from the first file.
+        """
+        self._chunks = None
+        self._exhausted = False
+        self._xs_chunk, self._ys_chunk = None, None
+        self._cursor = 0
+
+    def _read_chunk(self):
+        if self._exhausted:
+            raise StopIteration
+        if self._chunks is None:
+            self._chunks = self._iter_chunks()
+        try:
+            chunk = next(self._chunks)
+        except StopIteration:
+            self.epoch += 1
+            if not self.loop:
+                self._exhausted = True
+                raise StopIteration
+            self._chunks = self._iter_chunks()
+            chunk = next(self._chunks)
+        self._xs_chunk, self._ys_chunk = chunk
+        self._cursor = 0
+
+    def _iter_chunks(self):
+        for path in self.paths:
+            if path.endswith('.npy'):
+                array = np.load(path, mmap_mode='r')
+                y_index = [c if c >= 0 else array.shape[1] + c for c in self.y_columns]
+                x_index = [c for c in range(array.shape[1]) if c not in y_index]
+                for start in range(0, array.shape[0], self.chunk_size):
+                    block = array[start:start + self.chunk_size]
+                    yield [np.ascontiguousarray(block[:, x_index], dtype=self.dtype),
+                           np.ascontiguousarray(block[:, y_index], dtype=self.ys_dtype)]
+            else:
+                for frame in pd.read_csv(path, chunksize=self.chunk_size, **self._csv_kwargs):
+                    if all(isinstance(c, int) for c in self.y_columns):
+                        y_names = [frame.columns[c] for c in self.y_columns]
+                    else:
+                        y_names = self.y_columns
+                    yield [np.ascontiguousarray(frame.drop(y_names, axis=1).values, dtype=self.dtype),
+                           np.ascontiguousarray(frame[y_names].values, dtype=self.ys_dtype)]
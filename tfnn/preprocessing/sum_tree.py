@@ -0,0 +1,68 @@
+import numpy as np
+
+
+class SumTree(object):
+    def __init__(self, priorities):
+        """
+        A binary tree of partial sums over the sample priorities, stored in one flat array.
+        Drawing a batch costs O(batch_size * log n) and updating some priorities costs
+        O(n_updates * log n), both vectorized level by level.
+        :param priorities: 1-D non-negative weights, one for each sample
+        """
+        priorities = np.asarray(priorities, dtype=np.float64)
+        if priorities.ndim != 1:
+            raise ValueError('priorities must be 1-D')
+        if np.any(priorities < 0):
+            raise ValueError('priorities must be non-negative')
+        self.n_samples = priorities.shape[0]
+        self._depth = max(int(np.ceil(np.log2(max(self.n_samples, 1)))), 1)
+        self._capacity = 2 ** self._depth
+        # node i has the children 2i and 2i+1, the root is node 1 and the leaves start at capacity
+        self._tree = np.zeros(2 * self._capacity, dtype=np.float64)
+        self._tree[self._capacity:self._capacity + self.n_samples] = priorities
+        for level in range(self._depth - 1, -1, -1):
+            start, stop = 2 ** level, 2 ** (level + 1)
+            self._tree[start:stop] = self._tree[2 * start:2 * stop:2] + self._tree[2 * start + 1:2 * stop:2]
+
+    @property
+    def total(self):
+        return self._tree[1]
+
+    @property
+    def priorities(self):
+        return self._tree[self._capacity:self._capacity + self.n_samples]
+
+    def update(self, indices, priorities):
+        """
+        :param indices: sample positions
+        :param priorities: their new priorities
+        """
+        indices = np.asarray(indices, dtype=np.int64).reshape(-1)
+        priorities = np.broadcast_to(np.asarray(priorities, dtype=np.float64), indices.shape)
+        if np.any(priorities < 0):
+            raise ValueError('priorities must be non-negative')
+        nodes = indices + self._capacity
+        self._tree[nodes] = priorities
+        for _ in range(self._depth):
+            nodes = np.unique(nodes // 2)
+            self._tree[nodes] = self._tree[2 * nodes] + self._tree[2 * nodes + 1]
+
+    def sample(self, batch_size):
+        """
+        Stratified sampling with replacement, sample i is drawn with probability priority_i / total.
+        :param batch_size:
+        :return: 1-D int64 sample positions
+        """
+        if self.total <= 0:
+            raise ValueError('All the priorities are zero')
+        # one uniform value inside each of batch_size equal segments of the total
+        values = (np.arange(batch_size) + np.random.random_sample(batch_size)) * (self.total / batch_size)
+        nodes = np.ones(batch_size, dtype=np.int64)
+        for _ in range(self._depth):
+            left = 2 * nodes
+            left_sums = self._tree[left]
+            go_right = values >= left_sums
+            values -= np.where(go_right, left_sums, 0.)
+            nodes = left + go_right
+        # rounding can step onto an empty leaf at the very end, keep it inside the samples
+        return np.minimum(nodes - self._capacity, self.n_samples - 1)
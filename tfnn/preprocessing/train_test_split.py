@@ -1,18 +1,25 @@
 import tfnn
-from tfnn.preprocessing.shuffle import shuffle
+import numpy as np
 
 
 def train_test_split(data, train_rate=0.7, randomly=True):
-    data_copy = data.copy()
+    """
+    :return: [train, validate]. Random splits are tfnn.DataView objects which only hold
+            row indices into data, ordered splits are slices of it. Neither copies the data.
+    """
     _n_train_samples = int(data.n_samples * train_rate)
     if randomly:
-        data_copy = shuffle(data_copy)
-    train_data_data = data_copy.data[:_n_train_samples, :]
-    test_data_data = data_copy.data[_n_train_samples:, :]
-    train_data_data_xs = train_data_data[:, :data.n_xfeatures]
-    train_data_data_ys = train_data_data[:, data.n_xfeatures:]
-    test_data_data_xs = test_data_data[:, :data.n_xfeatures]
-    test_data_data_ys = test_data_data[:, data.n_xfeatures:]
-    t_data = tfnn.Data(train_data_data_xs, train_data_data_ys, name='train')
-    v_data = tfnn.Data(test_data_data_xs, test_data_data_ys, name='validate')
-    return [t_data, v_data]
\ No newline at end of file
+        indices = np.random.permutation(data.n_samples)
+        t_data = tfnn.DataView(data, indices[:_n_train_samples], name='train')
+        v_data = tfnn.DataView(data, indices[_n_train_samples:], name='validate')
+    elif type(data) is tfnn.Data:
+        # contiguous row slices of C-contiguous arrays are views, nothing is copied
+        t_data = tfnn.Data(data.xs[:_n_train_samples], data.ys[:_n_train_samples], name='train',
+                           dtype=data.dtype)
+        v_data = tfnn.Data(data.xs[_n_train_samples:], data.ys[_n_train_samples:], name='validate',
+                           dtype=data.dtype)
+    else:
+        indices = np.arange(data.n_samples)
+        t_data = tfnn.DataView(data, indices[:_n_train_samples], name='train')
+        v_data = tfnn.DataView(data, indices[_n_train_samples:], name='validate')
+    return [t_data, v_data]